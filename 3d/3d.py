@@ -1,8 +1,11 @@
 from math import cos, sin
 from collections import defaultdict
-from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+import argparse
 import json
+import sys
 from shutil import copyfileobj
 from zipfile import ZipFile
 
@@ -10,6 +13,8 @@ import numpy as np
 from scipy.spatial.transform import Rotation
 
 from vehicle_parts import parse_vehicle_parts
+import ldraw_lod
+import ldraw_mesh
 
 
 
@@ -103,6 +108,50 @@ def uetransform_to_ldraw(dict_):
     #print(tx, ty, tz)
     return ' '.join(str(e) for e in [tx*4/5, ty*4/5, tz*4/5] + [e for line in srm for e in line])
 
+def uetransforms_to_ldraw(transforms):
+    """[uetransform_to_ldraw(transform) for transform in transforms], with a single Rotation.from_quat
+    and array operations for the whole vehicle (same floats, so same strings, see check_transforms)"""
+    if not transforms:
+        return []
+    # the axis swaps and sign flips stay on the json values: -0 and -0.0 do not print the same
+    scales = np.array([xyz(t["Scale3D"]) for t in transforms], dtype=np.float64)
+    translations = np.array([change_base(*xyz(t["Translation"])) for t in transforms], dtype=np.float64)
+    quats = np.array([
+        [-q for q in change_base(*xyz(t["Rotation"]))] + [t["Rotation"]["W"]]
+        for t in transforms
+    ], dtype=np.float64)
+    # normalize quaternions
+    qx, qy, qz, qw = quats.T
+    norms = qx*qx + qy*qy + qz*qz + qw*qw
+    qn = 1 / np.array([n ** 0.5 for n in norms.tolist()])  # python's pow, which can differ from np.sqrt by 1 ulp
+    quats *= qn[:, None]
+
+    sm = np.zeros((len(transforms), 3, 3))
+    sm[:, [0, 1, 2], [0, 1, 2]] = scales
+    srm = sm @ Rotation.from_quat(quats).as_matrix()
+    values = np.concatenate([translations*4/5, srm.reshape(-1, 9)], axis=1)
+    return [' '.join(map(str, row)) for row in values.tolist()]
+
+def check_transforms(transforms):
+    """compare uetransforms_to_ldraw with uetransform_to_ldraw"""
+    batch = uetransforms_to_ldraw(transforms)
+    for i, (transform, line) in enumerate(zip(transforms, batch)):
+        assert line == uetransform_to_ldraw(transform), f'part {i}: {line} != {uetransform_to_ldraw(transform)}'
+    assert len(batch) == len(transforms)
+
+def random_transforms(n, seed=0):
+    """transforms like the ones of the brickgraphs: mostly right angles, some ints, some zeros"""
+    rng = np.random.default_rng(seed)
+    def value(x):
+        return rng.choice([x, round(x), 0, 0.0, -0.0, 1, 0.5, -0.7071067690849304, 0.7071067690849304])
+    def vector(*keys, scale=1.0):
+        return {key: float(value(rng.normal() * scale)) if rng.random() < 0.8 else int(rng.integers(-2, 3)) for key in keys}
+    return [{
+        "Rotation": vector("X", "Y", "Z", "W"),
+        "Translation": vector("X", "Y", "Z", scale=100),
+        "Scale3D": vector("X", "Y", "Z"),
+    } for _ in range(n)]
+
 def load(path, type="LegoPartGraphAsset", n_per_file=1):
     with open(path, encoding='utf-8') as f:
         json_dicts = [uecomponent for uecomponent in json.load(f) if uecomponent["Type"] == type]
@@ -110,55 +159,174 @@ def load(path, type="LegoPartGraphAsset", n_per_file=1):
             assert len(json_dicts) == n_per_file, f'found {len(json_dicts)} {type} in file {id}, expected {n_per_file}'
         return json_dicts[0]
 
-def convert(in_path, out_path, parts_zip_path, parts_dir_path):
-    bricks_and_colors = parse_vehicle_parts(in_path + '.uexp')
+def ldraw_lines(in_path):
+    """the LDraw type 1 lines (one per part) of a vehicle brickgraph (without extension)"""
+    bricks_and_colors = parse_vehicle_parts(in_path + '.uexp', verbose=0)
     transforms = load(in_path + '.json')["Properties"]["Graph"]["PartTransforms"]
+    return [f"1 {color} {transform} {brick_id}.dat"
+            for (brick_id, color), transform in zip(bricks_and_colors, uetransforms_to_ldraw(transforms))]
+
+def write_ldr(in_path, out_path):
+    """write the .ldr of a vehicle, and return the names of the parts it uses"""
+    lines = ldraw_lines(in_path)
     with open(out_path, 'w', encoding='utf-8') as f:
-        for (brick_id, color), transform in zip(bricks_and_colors, transforms):
-            unzip_needed_part(parts_zip_path, parts_dir_path, f"{brick_id}.dat")
-            line = f"1 {color} {uetransform_to_ldraw(transform)} {brick_id}.dat"
+        for line in lines:
             print(line, file=f)
-            #print(line)
-    print("converted", len(bricks_and_colors), "bricks to", out_path)
-
-@lru_cache
-def get_zippaths(zip_path):
-    """return a dict of {part_filename: full_path_in_the_zip}
-    we cache it since this is O(n_files_in_zip) and used a for each vehicle piece."""
-    zippaths = defaultdict(list)
-    with ZipFile(zip_path) as parts_zip:
-        for p in parts_zip.filelist:
-            zippaths[Path(p.filename).name].append(p.filename)
-    return zippaths
-
-def unzip_needed_part(zip_path, dir_path, part_name, depth=0):
-    for zippath in get_zippaths(zip_path)[part_name]:
-        out_path = Path(dir_path) / zippath.replace('ldraw/parts/', '').replace('ldraw/p/', '')
-        if out_path.is_file():
-            continue
-        #print(' |'*(depth+1), 'unzipping', Path(zip_path) / zippath, 'to', out_path)
-        print(' |'*(depth+1), 'unzipping', zippath)
-        out_path.parents[0].mkdir(parents=True, exist_ok=True)
-        with ZipFile(zip_path) as parts_zip:
-            with (parts_zip.open(zippath) as in_file, open(out_path, 'wb') as out_file):
-                copyfileobj(in_file, out_file)
-        # recursively unzip dependencies
+    print("converted", len(lines), "bricks to", out_path)
+    return {line.split()[-1] for line in lines}
+
+def part_key(part_name):
+    """LDraw file names are case insensitive, and sub-files are referenced with backslashes (e.g. s\\3001s01.dat)"""
+    return part_name.replace('\\', '/').split('/')[-1].lower()
+
+class PartsZip:
+    """ldraw_parts_complete.zip, opened once, with the dependencies of each part read once"""
+    def __init__(self, zip_path):
+        self.zip = ZipFile(zip_path)
+        self.zippaths = defaultdict(list)  # part key -> full paths in the zip
+        for p in self.zip.filelist:
+            self.zippaths[part_key(p.filename)].append(p.filename)
+        self.contents = {}      # zip path -> bytes, of the parts read to find their dependencies
+        self.closures = {}      # part key -> keys of the part and all its dependencies
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.zip.close()
+
+    def out_path(self, dir_path, zippath):
+        return Path(dir_path) / zippath.replace('ldraw/parts/', '').replace('ldraw/p/', '')
+
+    def read_part(self, reference, dir_path):
+        """the text of an LDraw file reference (e.g. 3001.dat, s\\3001s01.dat or 48\\1-4cyli.dat), None if not in the zip"""
+        relative = reference.replace('\\', '/').lower()
+        zippaths = self.zippaths[part_key(reference)]
+        if not zippaths:
+            return None
+        zippath = next((zippath for zippath in zippaths
+                        if zippath.replace('ldraw/parts/', '').replace('ldraw/p/', '').lower() == relative), zippaths[0])
+        out_path = self.out_path(dir_path, zippath)
+        content = out_path.read_bytes() if out_path.is_file() else self.zip.read(zippath)
+        return content.decode('utf-8', errors='replace')
+
+    def dependencies(self, key, dir_path):
+        """keys of the sub-files of a part, read from its extracted file if there is one"""
         deps = set()
-        with open(out_path) as f:
-            for line in f:
+        for zippath in self.zippaths[key]:
+            out_path = self.out_path(dir_path, zippath)
+            if out_path.is_file():
+                content = out_path.read_bytes()
+            else:
+                content = self.contents[zippath] = self.zip.read(zippath)
+            for line in content.decode('utf-8', errors='replace').splitlines():
                 line = line.strip()
                 if line.startswith('1'):  # load sub-file instruction
-                    deps.add(line.split()[-1])
-        for dep in deps:
-            unzip_needed_part(zip_path, dir_path, dep, depth+1)
+                    deps.add(part_key(line.split()[-1]))
+        return deps
 
-if __name__ == '__main__':
-    vehicle_id = "Bajambug_VC000"
+    def closure(self, key, dir_path):
+        """the key of a part and of all its (recursive) dependencies, memoized"""
+        if key not in self.closures:
+            self.closures[key] = set()  # in case of a dependency cycle
+            closure = {key}
+            for dep in self.dependencies(key, dir_path):
+                closure |= self.closure(dep, dir_path)
+            self.closures[key] = closure
+        return self.closures[key]
 
-    base_path = "../Exports/LEGO2KDrive/Content/"
-    parts_zip_path = '../dependencies/buildinginstructions.js/ldraw_parts_complete.zip'
-    parts_dir_path = '../dependencies/buildinginstructions.js/ldraw_parts'
+    def extract(self, part_names, dir_path):
+        """extract the given parts and their dependencies (the ones not already in dir_path), in a single pass"""
+        needed = set()
+        for part_name in part_names:
+            needed |= self.closure(part_key(part_name), dir_path)
+        all_zippaths = [zippath for key in needed for zippath in self.zippaths[key]]
+        zippaths = [zippath for zippath in all_zippaths if not self.out_path(dir_path, zippath).is_file()]
+        if missing := sorted(key for key in needed if not self.zippaths[key]):
+            print(' | not in the zip:', *missing)
+        for zippath in sorted(zippaths, key=lambda zippath: self.zip.getinfo(zippath).header_offset):
+            out_path = self.out_path(dir_path, zippath)
+            out_path.parents[0].mkdir(parents=True, exist_ok=True)
+            if zippath in self.contents:
+                out_path.write_bytes(self.contents.pop(zippath))
+            else:
+                with (self.zip.open(zippath) as in_file, open(out_path, 'wb') as out_file):
+                    copyfileobj(in_file, out_file)
+        print(f"-> Extracted {len(zippaths)} of the {len(all_zippaths)} needed part files to {dir_path}")
 
+def convert_vehicle(vehicle_id, lod=False):
+    """write vehicles/<vehicle_id>.ldr (and its ldraw_lod levels if lod),
+    return the names of its parts (None if it could not be converted)"""
     in_path = base_path + "Game/Vehicle/Configs/BrickGraphs/" + vehicle_id
-    out_path = 'vehicles/' + vehicle_id + '.ldr'
-    convert(in_path, out_path, parts_zip_path, parts_dir_path)
+    try:
+        part_names = write_ldr(in_path, 'vehicles/' + vehicle_id + '.ldr')
+    except (FileNotFoundError, AssertionError) as e:
+        print(' | could not convert', vehicle_id, ':', e)
+        return None
+    if lod:
+        ldraw_lod.write_levels('vehicles/' + vehicle_id + '.ldr', ldraw_lod.brick_sizes(), ldraw_lod.transparent_colours(ldconfig_path))
+        part_names.add(ldraw_lod.proxy_part)
+    return part_names
+
+def ldr_paths(vehicle_id, lod=False):
+    paths = ['vehicles/' + vehicle_id + '.ldr']
+    if lod:
+        paths += ['vehicles/' + vehicle_id + f'.lod{level}.ldr' for level in (1, 2)]
+    return paths
+
+def convert_all(vehicle_ids, parts_zip_path, parts_dir_path, jobs=1, meshes_path=None, lod=False):
+    """the .ldr of every vehicle (written by jobs processes, with their levels of detail if lod), then the union
+    of their parts, extracted once, and if meshes_path is given, the binaries of ldraw_mesh"""
+    Path('vehicles/').mkdir(exist_ok=True)
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            all_part_names = list(executor.map(partial(convert_vehicle, lod=lod), vehicle_ids, chunksize=8))
+    else:
+        all_part_names = [convert_vehicle(vehicle_id, lod) for vehicle_id in vehicle_ids]
+    part_names = set().union(*(names for names in all_part_names if names is not None))
+    converted = [vehicle_id for vehicle_id, names in zip(vehicle_ids, all_part_names) if names is not None]
+    with PartsZip(parts_zip_path) as parts_zip:
+        parts_zip.extract(part_names, parts_dir_path)
+        if meshes_path is not None:
+            ldraw_mesh.build([path for vehicle_id in converted for path in ldr_paths(vehicle_id, lod)],
+                             partial(parts_zip.read_part, dir_path=parts_dir_path), meshes_path, ldconfig_path)
+    n_converted = len(converted)
+    print(f"-> Converted {n_converted} of {len(vehicle_ids)} vehicles, using {len(part_names)} different parts")
+
+
+base_path = "../Exports/LEGO2KDrive/Content/"
+parts_zip_path = '../dependencies/buildinginstructions.js/ldraw_parts_complete.zip'
+parts_dir_path = '../dependencies/buildinginstructions.js/ldraw_parts'
+ldconfig_path = 'dependencies/buildinginstructions.js/ldconfig.ldr'
+meshes_path = 'meshes/'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='convert vehicle brickgraphs to LDraw .ldr files, in ./vehicles/')
+    parser.add_argument('vehicle_ids', nargs='*', default=["Bajambug_VC000"])
+    parser.add_argument('--all', action='store_true', help='convert every vehicle of ../data/vehicles_by_id.json')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes writing the .ldr files')
+    parser.add_argument('--meshes', action='store_true',
+                        help=f'also write the vehicles as binaries for instanced rendering, in {meshes_path} (see ldraw_mesh.py)')
+    parser.add_argument('--lod', action='store_true',
+                        help='also write lighter levels of detail of the vehicles, and their .lod.json manifest (see ldraw_lod.py)')
+    parser.add_argument('--check', action='store_true',
+                        help='only check the batched transform conversion against the per-part one, on random transforms and the given vehicles')
+    args = parser.parse_args()
+
+    if args.check:
+        for seed in range(10):
+            check_transforms([t for t in random_transforms(1000, seed) if any(t["Rotation"].values())])
+        for vehicle_id in args.vehicle_ids:
+            in_path = base_path + "Game/Vehicle/Configs/BrickGraphs/" + vehicle_id
+            if Path(in_path + '.json').is_file():
+                check_transforms(load(in_path + '.json')["Properties"]["Graph"]["PartTransforms"])
+                print(vehicle_id, 'ok')
+        print('the batched transform conversion match the per-part one')
+        sys.exit()
+
+    vehicle_ids = args.vehicle_ids
+    if args.all:
+        with open('../data/vehicles_by_id.json', encoding='utf-8') as f:
+            vehicle_ids = list(json.load(f))
+    # also for a few vehicles, since their meshes/*.bin refer to the parts.json written with them
+    convert_all(vehicle_ids, parts_zip_path, parts_dir_path, args.jobs, meshes_path if args.meshes else None, args.lod)
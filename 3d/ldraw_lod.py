@@ -0,0 +1,154 @@
+"""Lighter levels of detail of the vehicle .ldr written by 3d.py, for the viewers that cannot draw 10000 bricks
+
+The bricks are put in an occupancy grid (20 x 8 x 20 LDraw units, a stud by a plate, aligned with most bricks),
+from their GridSize of ../data/bricks_by_id.json. A brick is hidden if none of its cells touches the outside air (the empty cells
+reachable from around the vehicle); transparent bricks do not occupy any cell, and the bricks without a known
+size or not aligned with the grid are always kept.
+
+vehicles/<vehicle id>.ldr: every brick (level 0, written by 3d.py)
+vehicles/<vehicle id>.lod1.ldr: only the visible bricks
+vehicles/<vehicle id>.lod2.ldr: the visible bricks as box.dat proxies of their GridSize
+vehicles/<vehicle id>.lod.json: {'version', 'levels': [{'level', 'path', 'n_parts'}, ...]}, coarsest level first,
+                                 paths relative to it (with --meshes, meshes/<stem of path>.bin for each level)
+"""
+
+import json
+from collections import Counter
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+from scipy import ndimage
+
+
+version = 1
+cell_size = np.array([20.0, 8.0, 20.0])  # a stud wide, a plate high
+tolerance = 1e-3  # cell centers must be that far inside a brick (so that rounding errors never hide anything)
+max_cells = 4096  # per brick, beyond that (e.g. rotated baseplates) the brick is kept and does not occupy cells
+proxy_part = 'box.dat'  # the LDraw cube primitive, from -1 to 1 on each axis
+
+
+@cache
+def brick_sizes(bricks_by_id_path='../data/bricks_by_id.json'):
+    """{LDraw part file: GridSize (studs along x, studs along z, plates along y)}, aliases included"""
+    with open(bricks_by_id_path, encoding='utf-8') as f:
+        bricks = json.load(f)
+    sizes = {}
+    for brick in bricks.values():
+        for id in [brick['id']] + brick['aliases']:
+            sizes.setdefault(f'{id}.dat', tuple(brick['size']))
+    return sizes
+
+@cache
+def transparent_colours(ldconfig_path):
+    """LDraw colour codes with an ALPHA in ldconfig.ldr"""
+    colours = set()
+    with open(ldconfig_path, encoding='utf-8') as f:
+        for line in f:
+            tokens = line.split()
+            if tokens[1:2] == ['!COLOUR'] and 'CODE' in tokens and 'ALPHA' in tokens:
+                colours.add(int(tokens[tokens.index('CODE') + 1]))
+    return colours
+
+def local_box(size):
+    """(min, max) corners of a brick in its part coordinates: centered on x and z, from its top (y = 0) down"""
+    x, z, y = size
+    return np.array([-10.0 * x, 0.0, -10.0 * z]), np.array([10.0 * x, 8.0 * y, 10.0 * z])
+
+
+def placed_corners(box, values):
+    """(8, 3) corners of a box placed by the 12 values of an .ldr line"""
+    corners = np.stack(np.meshgrid(*zip(*box), indexing='ij'), axis=-1).reshape(8, 3)
+    return corners @ values[3:].reshape(3, 3).T + values[:3]
+
+def grid_origin(boxes, all_values):
+    """a corner of the grid cells, on the most common corners of the bricks (modulo the cell size)"""
+    phases = Counter(tuple(np.round(np.mod(placed_corners(box, values).min(axis=0), cell_size), 2).tolist())
+                     for box, values in zip(boxes, all_values))
+    return np.array(phases.most_common(1)[0][0]) if phases else np.zeros(3)
+
+def brick_cells(box, values, origin):
+    """(n, 3) int indices of the grid cells whose center is inside a brick placed by the 12 values of its .ldr line"""
+    box_min, box_max = box
+    translation, matrix = values[:3], values[3:].reshape(3, 3)
+    placed = placed_corners(box, values)
+    first = np.ceil((placed.min(axis=0) - origin) / cell_size - 0.5).astype(int)
+    last = np.floor((placed.max(axis=0) - origin) / cell_size - 0.5).astype(int)
+    if np.any(last < first) or np.prod(last - first + 1) > max_cells:
+        return np.empty((0, 3), dtype=int)
+    indices = np.stack(np.meshgrid(*(np.arange(a, b + 1) for a, b in zip(first, last)), indexing='ij'), axis=-1).reshape(-1, 3)
+    try:
+        local = np.linalg.solve(matrix, (origin + (indices + 0.5) * cell_size - translation).T).T
+    except np.linalg.LinAlgError:  # flattened brick
+        return np.empty((0, 3), dtype=int)
+    inside = np.all((local > box_min + tolerance) & (local < box_max - tolerance), axis=1)
+    return indices[inside]
+
+def visible_bricks(part_files, colours, values, sizes, transparent=()):
+    """(n,) bool array, False for the bricks with no cell next to the outside air"""
+    solid = [part_file in sizes and colour not in transparent for part_file, colour in zip(part_files, colours)]
+    boxes = [local_box(sizes[part_file]) if is_solid else None for part_file, is_solid in zip(part_files, solid)]
+    origin = grid_origin([box for box in boxes if box is not None], values[np.array(solid, dtype=bool)])
+    cells = [
+        brick_cells(box, row, origin) if box is not None else np.empty((0, 3), dtype=int)
+        for box, row in zip(boxes, values)
+    ]
+    visible = np.array([not len(brick) for brick in cells], dtype=bool)
+    if visible.all():
+        return visible
+    all_cells = np.concatenate(cells)
+    first = all_cells.min(axis=0) - 1  # an empty layer all around, so that the outside is connected
+    occupied = np.zeros(all_cells.max(axis=0) - first + 2, dtype=bool)
+    occupied[tuple((all_cells - first).T)] = True
+    empty_regions, _ = ndimage.label(~occupied)
+    outside = empty_regions == empty_regions[0, 0, 0]
+    touching_outside = occupied & ndimage.binary_dilation(outside)
+    for i, brick in enumerate(cells):
+        if len(brick):
+            visible[i] = touching_outside[tuple((brick - first).T)].any()
+    return visible
+
+def proxy_values(size, values):
+    """the 12 values of the box.dat line filling the GridSize box of a brick"""
+    box_min, box_max = local_box(size)
+    translation, matrix = values[:3], values[3:].reshape(3, 3)
+    center, half = (box_min + box_max) / 2, (box_max - box_min) / 2
+    return np.concatenate([translation + matrix @ center, (matrix * half).reshape(9)])
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [line for line in f.read().splitlines() if line.split()[:1] == ['1'] and len(line.split()) >= 15]
+
+def ldraw_line(colour, values, part_file):
+    return f"1 {colour} {' '.join(map(str, values.tolist()))} {part_file}"
+
+def write_levels(ldr_path, sizes, transparent=()):
+    """write the .lod1.ldr, .lod2.ldr and .lod.json next to an .ldr, return the paths of the written .ldr"""
+    ldr_path = Path(ldr_path)
+    lines = read_lines(ldr_path)
+    part_files = [' '.join(line.split()[14:]) for line in lines]
+    colours = [int(line.split()[1]) for line in lines]
+    values = np.array([[float(e) for e in line.split()[2:14]] for line in lines], dtype=np.float64).reshape(-1, 12)
+    visible = visible_bricks(part_files, colours, values, sizes, transparent)
+
+    shell = [line for line, keep in zip(lines, visible) if keep]
+    proxies = [
+        ldraw_line(colour, proxy_values(sizes[part_file], row), proxy_part) if part_file in sizes else line
+        for line, part_file, colour, row, keep in zip(lines, part_files, colours, values, visible) if keep
+    ]
+    stem = ldr_path.name.removesuffix('.ldr')
+    levels = [(2, ldr_path.with_name(stem + '.lod2.ldr'), proxies),
+              (1, ldr_path.with_name(stem + '.lod1.ldr'), shell),
+              (0, ldr_path, lines)]
+    for level, path, level_lines in levels[:2]:
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in level_lines:
+                print(line, file=f)
+    manifest = {'version': version, 'levels': [
+        {'level': level, 'path': path.name, 'n_parts': len(level_lines)} for level, path, level_lines in levels
+    ]}
+    with open(ldr_path.with_name(stem + '.lod.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    print(f"lod of {stem}: {len(lines)} bricks, {len(shell)} visible")
+    return [path for _, path, _ in levels[:2]]
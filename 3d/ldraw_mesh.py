@@ -0,0 +1,177 @@
+"""Vehicles as binaries a viewer can draw with GPU instancing, without resolving any LDraw sub-file at runtime
+
+Built from the .ldr written by 3d.py and the LDraw parts they use (see 3d.py --meshes).
+Everything is little endian, in LDraw units and axes.
+
+meshes/parts.json: {'version', 'colours': {LDraw colour code: '#RRGGBB'}, 'positions_offset', 'colours_offset',
+                    'parts': {part file: [first triangle, number of triangles, xmin, ymin, zmin, xmax, ymax, zmax]}}
+meshes/parts.bin: the triangles of every part, flattened (sub-files resolved), one part after the other:
+- at positions_offset: 9 float32 per triangle (x, y, z of its 3 vertices)
+- at colours_offset: 1 uint32 per triangle, its LDraw colour code, 16 meaning the colour of the instance
+meshes/<vehicle id>.bin:
+- header: b'L2KV', then uint32 version, number of groups, number of instances, then 6 float32 bounding box
+- groups: 3 uint32 per part used (index in parts.json parts, first instance, number of instances)
+- instances, sorted by part (duplicates removed): 12 float32 each, x y z a b c d e f g h i as in
+  an .ldr line (the part vertices p becoming [[a, b, c], [d, e, f], [g, h, i]] @ p + [x, y, z])
+- colours: 1 uint32 per instance, its colour code as written in the .ldr (game colours do not fit in 16 bits,
+  e.g. 4278255891, and are not in parts.json colours)
+"""
+
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+
+version = 2
+magic = b'L2KV'
+inherited_colour = 16
+
+
+def read_ldr(path):
+    """(part files, colour codes, (n, 12) float array) of the type 1 lines of an .ldr"""
+    parts, colours, values = [], [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            tokens = line.split()
+            if len(tokens) >= 15 and tokens[0] == '1':
+                colours.append(int(tokens[1]))
+                values.append([float(e) for e in tokens[2:14]])
+                parts.append(' '.join(tokens[14:]))
+    return parts, colours, np.array(values, dtype=np.float64).reshape(-1, 12)
+
+def read_colours(ldconfig_path):
+    """{colour code: '#RRGGBB'} of ldconfig.ldr"""
+    colours = {}
+    with open(ldconfig_path, encoding='utf-8') as f:
+        for line in f:
+            tokens = line.split()
+            if tokens[1:2] == ['!COLOUR'] and 'CODE' in tokens and 'VALUE' in tokens:
+                colours[int(tokens[tokens.index('CODE') + 1])] = tokens[tokens.index('VALUE') + 1]
+    return colours
+
+
+class Geometry:
+    """the triangles of LDraw files, sub-files resolved, each file flattened once"""
+    def __init__(self, read):
+        """read(file reference) -> its text, or None if it cannot be found"""
+        self.read = read
+        self.flattened = {}  # normalized reference -> ((n, 3, 3) vertices, (n,) uint32 colour codes)
+        self.missing = set()
+
+    def triangles(self, reference):
+        key = reference.replace('\\', '/').lower()
+        if key not in self.flattened:
+            self.flattened[key] = np.empty((0, 3, 3)), np.empty(0, dtype=np.uint32)  # in case of a cycle
+            self.flattened[key] = self.flatten(reference)
+        return self.flattened[key]
+
+    def flatten(self, reference):
+        text = self.read(reference)
+        if text is None:
+            self.missing.add(reference)
+            return self.flattened[reference.replace('\\', '/').lower()]
+        vertices, colours = [], []
+        sub_vertices, sub_colours = [], []
+        for line in text.splitlines():
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == '3' and len(tokens) >= 11:
+                vertices.append([float(e) for e in tokens[2:11]])
+                colours.append(int(tokens[1]))
+            elif tokens[0] == '4' and len(tokens) >= 14:
+                quad = [float(e) for e in tokens[2:14]]
+                vertices += [quad[0:9], quad[0:3] + quad[6:12]]
+                colours += [int(tokens[1])] * 2
+            elif tokens[0] == '1' and len(tokens) >= 15:
+                x, y, z, a, b, c, d, e, f, g, h, i = (float(e) for e in tokens[2:14])
+                child_vertices, child_colours = self.triangles(' '.join(tokens[14:]))
+                matrix = np.array([[a, b, c], [d, e, f], [g, h, i]])
+                sub_vertices.append(child_vertices @ matrix.T + [x, y, z])
+                colour = int(tokens[1])
+                sub_colours.append(child_colours if colour == inherited_colour
+                                   else np.where(child_colours == inherited_colour, colour, child_colours))
+        return (
+            np.concatenate([np.array(vertices, dtype=np.float64).reshape(-1, 3, 3)] + sub_vertices),
+            np.concatenate([np.array(colours, dtype=np.uint32)] + sub_colours).astype(np.uint32),
+        )
+
+
+def bounding_box(vertices):
+    if not len(vertices):
+        return [0.0] * 6
+    points = vertices.reshape(-1, 3)
+    return points.min(axis=0).tolist() + points.max(axis=0).tolist()
+
+def parts_buffer(part_files, geometry):
+    """(parts.json without the colours, parts.bin) of the given parts"""
+    parts = {}
+    all_vertices, all_colours = [], []
+    n_triangles = 0
+    for part_file in part_files:
+        vertices, colours = geometry.triangles(part_file)
+        parts[part_file] = [n_triangles, len(vertices)] + bounding_box(vertices)
+        all_vertices.append(vertices.astype('<f4'))
+        all_colours.append(colours.astype('<u4'))
+        n_triangles += len(vertices)
+    positions = np.concatenate(all_vertices).tobytes() if all_vertices else b''
+    colours = np.concatenate(all_colours).tobytes() if all_colours else b''
+    header = {'version': version, 'positions_offset': 0, 'colours_offset': len(positions), 'parts': parts}
+    return header, positions + colours
+
+def vehicle_buffer(ldr_path, part_index, part_boxes):
+    """the meshes/<vehicle id>.bin of an .ldr, part_index and part_boxes being from parts.json"""
+    part_files, colours, values = read_ldr(ldr_path)
+    # merge duplicates (same part, colour and placement), sort by part
+    instances = {}
+    for part_file, colour, row in zip(part_files, colours, values.astype('<f4')):
+        instances.setdefault((part_index[part_file], colour, row.tobytes()), row)
+    keys = sorted(instances, key=lambda key: key[:2])
+    matrices = np.array([instances[key] for key in keys], dtype='<f4').reshape(-1, 12)
+    instance_parts = np.array([key[0] for key in keys], dtype=np.int64)
+    groups = []
+    for part in dict.fromkeys(instance_parts.tolist()):
+        first = int(np.searchsorted(instance_parts, part))
+        groups.append((part, first, int(np.searchsorted(instance_parts, part, side='right')) - first))
+
+    # bounding box: the 8 corners of each part box, placed
+    if len(keys):
+        boxes = np.array([part_boxes[part] for part in instance_parts.tolist()]).reshape(-1, 2, 3)
+        corners = np.stack(np.meshgrid([0, 1], [0, 1], [0, 1], indexing='ij'), axis=-1).reshape(8, 3)
+        points = boxes[:, corners, [0, 1, 2]]  # (n, 8, 3)
+        rotations = matrices[:, 3:].astype(np.float64).reshape(-1, 3, 3)
+        placed = points @ rotations.transpose(0, 2, 1) + matrices[:, None, :3]
+        box = placed.reshape(-1, 3).min(axis=0).tolist() + placed.reshape(-1, 3).max(axis=0).tolist()
+    else:
+        box = [0.0] * 6
+
+    colours = np.array([key[1] for key in keys], dtype='<u4').tobytes()
+    return b''.join([
+        magic, struct.pack('<3I6f', version, len(groups), len(keys), *box),
+        np.array(groups, dtype='<u4').reshape(-1, 3).tobytes(),
+        matrices.tobytes(),
+        colours,
+    ])
+
+def build(ldr_paths, read, out_dir, ldconfig_path=None):
+    """write out_dir/parts.json, parts.bin and <vehicle id>.bin for each .ldr"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    part_files = sorted({part for path in ldr_paths for part in read_ldr(path)[0]})
+    geometry = Geometry(read)
+    header, buffer = parts_buffer(part_files, geometry)
+    header['colours'] = read_colours(ldconfig_path) if ldconfig_path is not None else {}
+    (out_dir / 'parts.bin').write_bytes(buffer)
+    with open(out_dir / 'parts.json', 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+    if geometry.missing:
+        print(' | could not find', len(geometry.missing), 'LDraw files:', *sorted(geometry.missing)[:10])
+    print(f"-> Wrote {len(part_files)} part meshes ({len(buffer)} bytes) to {out_dir / 'parts.bin'}")
+
+    part_index = {part: i for i, part in enumerate(part_files)}
+    part_boxes = [header['parts'][part][2:] for part in part_files]
+    for path in ldr_paths:
+        (out_dir / (Path(path).stem + '.bin')).write_bytes(vehicle_buffer(path, part_index, part_boxes))
+    print(f"-> Wrote {len(ldr_paths)} vehicle meshes to {out_dir}")
@@ -1,19 +1,22 @@
-import { load_vehicle, load_brick, load_source, load_async, snakecase, load_simple } from './load.js';
+import { load_vehicle, load_brick, load_source, resolve_sources, load_async, snakecase, load_simple, fetch_bricks,
+         fetch_brick_details, fetch_brick_usage } from './load.js';
 import { tiles } from './tiles.js';
 
 {
   const id = get_url_param()
   
   Promise.all([
-    fetch(`data/brick_usage/${id}.json`).then(response => response.json()),
-    fetch('data/bricks_by_id.json').then(response => response.json()),
+    fetch_bricks(),
+    fetch_brick_details(id),
+    fetch_brick_usage(id),
     fetch('data/brickpacks_by_id.json').then(response => response.json()),
     fetch('data/vehicles_by_id.json').then(response => response.json())
   ]
-  ).then(([brick, all_bricks, all_brickpacks, all_vehicles]) => {
+  ).then(([all_bricks, details, usage, all_brickpacks, all_vehicles]) => {
+    let brick = {...all_bricks[id], ...details, usage: usage};
     load_main_brick(brick);
     load_aliases(brick, all_bricks);
-    load_brickpacks(brick, all_brickpacks);
+    resolve_sources(brick.sources).then(sources => load_brickpacks(brick, sources, all_brickpacks));
     load_usage(brick, all_vehicles);
   });
 }
@@ -35,8 +38,8 @@ function load_aliases(brick, all_bricks) {
   load_async(aliases, load_brick, "aliases", "bricks_template");
 }
 
-function load_brickpacks(brick, all_brickpacks) {
-  let brickpack_ids = brick.sources.map(source => source.name);
+function load_brickpacks(brick, sources, all_brickpacks) {
+  let brickpack_ids = sources.map(source => source.name);
   let brickpacks = brickpack_ids.map(id => all_brickpacks[id]);
   for (let bp of brickpacks) {
     if (bp.name == 'Default') {
@@ -0,0 +1,107 @@
+"""Brick aliases as dense tables indexed by part id, shared by dump_infos, vehicle_parts and surplus_v2
+
+A part id (as found in the brickgraphs) is either a brick id, or an alias declared by some bricks:
+- canonical[part id]: the brick it stands for, itself for a brick, else the first brick (in id order)
+  declaring it, -1 for unknown ids (this is dump_infos.brick_aliases as a table)
+- group(id): the ids linked to it by alias declarations, in either direction (union-find)
+- in_brick_pack[part id]: 1 if this very id is in a brick pack (see surplus_v2 and is_in_brick_pack)
+The tables are stdlib arrays, that numpy can use without copying them (see as_numpy).
+"""
+
+from array import array
+from collections import defaultdict
+
+import brick_catalogue
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+numpy_dtypes = {'b': 'i1', 'i': 'i4', 'd': 'f8'}
+
+
+class AliasResolver:
+    def __init__(self, declared_aliases, in_brick_pack=()):
+        """declared_aliases: {brick id: [its aliases, without itself]}, in brick id order"""
+        self.brick_aliases = {}  # part id -> brick id, in the order dump_infos writes them
+        for id, aliases in declared_aliases.items():
+            self.brick_aliases[id] = id
+            for alias in aliases:
+                if alias not in self.brick_aliases:  # priority for the brick with the id
+                    self.brick_aliases[alias] = id
+        self.size = max(self.brick_aliases, default=-1) + 1
+        self.canonical = array('i', [-1]) * self.size
+        for part, brick in self.brick_aliases.items():
+            self.canonical[part] = brick
+        self.in_brick_pack = array('b', [0]) * self.size
+        for id in in_brick_pack:
+            if id < self.size:
+                self.in_brick_pack[id] = 1
+
+        parent = array('i', range(self.size))
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]  # path halving
+                x = parent[x]
+            return x
+        for id, aliases in declared_aliases.items():
+            for alias in aliases:
+                a, b = find(id), find(alias)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+        groups = defaultdict(list)
+        for part in sorted(self.brick_aliases):
+            groups[find(part)].append(part)
+        self.groups = {part: group for group in groups.values() for part in group}
+
+    def knows(self, part):
+        return 0 <= part < self.size and self.canonical[part] != -1
+
+    def is_in_brick_pack(self, part):
+        return 0 <= part < self.size and self.in_brick_pack[part] == 1
+
+    def group(self, id):
+        """sorted ids of the alias group of id (including id)"""
+        return self.groups.get(id, [id])
+
+    def all_groups(self):
+        return list({id(group): group for group in self.groups.values()}.values())
+
+    def per_part(self, values, default=0.0):
+        """dense array('d') of the values ({brick id: float}) of the brick each part id stands for
+        (default for the parts without a value, e.g. 0 so that they do not count in a total)"""
+        table = array('d', [default]) * self.size
+        for part, brick in self.brick_aliases.items():
+            if brick in values:
+                table[part] = values[brick]
+        return table
+
+def as_numpy(table):
+    """a numpy view of one of the AliasResolver tables"""
+    return np.frombuffer(table, dtype=numpy_dtypes[table.typecode])
+
+def total(table, parts):
+    """sum(table[part] for part in parts), vectorized when numpy is there (still summed left to right)"""
+    if not parts:
+        return 0
+    if np is None:
+        return sum(table[part] for part in parts)
+    return float(np.cumsum(as_numpy(table)[np.asarray(parts)])[-1])
+
+
+resolver = None
+
+def get():
+    """the resolver of the brick catalogue, built on first use"""
+    global resolver
+    if resolver is None:
+        catalogue = brick_catalogue.get()
+        resolver = AliasResolver(catalogue.declared_aliases, catalogue.in_brick_pack)
+    return resolver
+
+
+if __name__ == '__main__':
+    groups = [group for group in get().all_groups() if len(group) > 1]
+    print(len(get().brick_aliases), 'part ids in', len(groups), 'alias groups, the biggest being', max(groups, key=len, default=[]))
@@ -0,0 +1,94 @@
+"""Brick ids, aliases, names and bIsInBrickPack from LEGO/Bricks/*.json, shared by vehicle_parts and surplus_v2
+
+Nothing is read at import time. The first get() parses the brick exports, and saves the result
+to .build_cache/brick_catalogue.pickle, keyed on a fingerprint of the exports (names, sizes
+and mtimes), so that the next runs only stat() the exports instead of parsing them again.
+"""
+
+import hashlib
+import json
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from glob import glob
+
+
+bricks_path = "../Exports/LEGO2KDrive/Content/LEGO/Bricks/"
+snapshot_path = Path('.build_cache/brick_catalogue.pickle')
+version = 2  # bump this when changing what is parsed
+
+
+@dataclass
+class BrickCatalogue:
+    ids: list[int]             # sorted
+    aliases: dict[int, int]    # alias -> id, the last brick (in id order) declaring an alias wins
+    names: dict[int, str]      # id -> PartName, or the id if it has none
+    in_brick_pack: set[int]    # ids having bIsInBrickPack, including the starting parts (DefaultBrickPack)
+    ids_or_aliases: frozenset[int]
+    declared_aliases: dict[int, list[int]]  # id -> its Aliases (without itself), in id order, see alias_resolver
+
+catalogue = None
+
+def get():
+    """the brick catalogue, parsed (or read from the snapshot) on first use"""
+    global catalogue
+    if catalogue is None:
+        catalogue = load()
+    return catalogue
+
+def brick_paths():
+    return sorted(
+        (path for path in glob(bricks_path + "*.json") if Path(path).stem.isnumeric()),
+        key=lambda path: int(Path(path).stem)
+    )
+
+def fingerprint(paths):
+    hash = hashlib.blake2b(str(version).encode(), digest_size=16)
+    for path in paths:
+        stat = Path(path).stat()
+        hash.update(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+    return hash.hexdigest()
+
+def load():
+    paths = brick_paths()
+    key = fingerprint(paths)
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot['fingerprint'] == key:
+            return snapshot['catalogue']
+    except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+        pass
+    catalogue = parse(paths)
+    try:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(snapshot_path, 'wb') as f:
+            pickle.dump({'fingerprint': key, 'catalogue': catalogue}, f)
+    except OSError as e:
+        print(' | could not save the brick catalogue snapshot:', e)
+    return catalogue
+
+def parse(paths):
+    ids, aliases, names, in_brick_pack, declared_aliases = [], {}, {}, set(), {}
+    for path in paths:
+        id = int(Path(path).stem)
+        ids.append(id)
+        declared_aliases[id] = []
+        with open(path) as f:
+            try:
+                properties = [d for d in json.load(f) if d["Type"] == "LegoPart"][0]["Properties"]
+                for alias in properties.get("Aliases") or []:
+                    aliases[alias] = id
+                declared_aliases[id] = [alias for alias in properties.get("Aliases") or [] if alias != id]
+                names[id] = properties["PartName"].get("CultureInvariantString", str(id))
+                if properties.get("bIsInBrickPack", False):
+                    in_brick_pack.add(id)
+            except (IndexError, KeyError, ValueError) as e:
+                print(" | could not parse brick", id, ":", e)
+    return BrickCatalogue(ids, aliases, names, in_brick_pack, frozenset(ids).union(aliases), declared_aliases)
+
+
+if __name__ == '__main__':
+    catalogue = get()
+    print(len(catalogue.ids), 'bricks,', len(catalogue.aliases), 'aliases,',
+          len(catalogue.in_brick_pack), 'parts in packs.')
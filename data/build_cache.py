@@ -0,0 +1,135 @@
+"""Persistent cache of what dump_infos.py already parsed and wrote, keyed on the input files fingerprints
+
+Each input file is fingerprinted with its size, mtime and content hash. The hash is only
+recomputed when the size or mtime changed, so an untouched export costs a single stat().
+"""
+
+import hashlib
+import pickle
+from pathlib import Path
+
+import profiling
+
+cache_path = Path('.build_cache/manifest.pickle')
+version = 1  # bump this to invalidate every cached output, e.g. after changing a parser
+enabled = True
+
+files = {}    # path -> (size, mtime_ns, content hash), as seen by the last run(s)
+entries = {}  # (kind, path, *key) -> (content hash, parser output)
+outputs = {}  # output path -> (inputs key, (size, mtime_ns)) of the file as we wrote it
+n_hits = 0
+n_misses = 0
+
+
+def load_manifest():
+    global files, entries, outputs
+    if not enabled or not cache_path.is_file():
+        return
+    try:
+        with open(cache_path, 'rb') as f:
+            manifest = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError) as e:
+        print(' | could not read the build cache, starting from scratch:', e)
+        return
+    if manifest.get('version') == version:
+        files, entries, outputs = manifest['files'], manifest['entries'], manifest['outputs']
+
+def save():
+    if not enabled:
+        return
+    # forget about the inputs that disappeared, e.g. renamed exports
+    for path in [path for path in files if not Path(path).exists()]:
+        del files[path]
+    for key in [key for key in entries if key[1] not in files]:
+        del entries[key]
+    # and the outputs that were deleted
+    for path in [path for path in outputs if not Path(path).exists()]:
+        del outputs[path]
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, 'wb') as f:
+        pickle.dump({'version': version, 'files': files, 'entries': entries, 'outputs': outputs}, f)
+    print(f'-> Build cache: {n_hits} reused, {n_misses} (re)computed')
+
+def value_hash(value):
+    """hash of any picklable value, usable as (part of) a cache key"""
+    return hashlib.blake2b(pickle.dumps(value), digest_size=16).hexdigest()
+
+def content_hash(path):
+    path = str(path)
+    stat = Path(path).stat()
+    known = files.get(path)
+    if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):  # a file rewritten since gets a new stat
+        return known[2]
+    hash = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hash.update(chunk)
+    files[path] = (stat.st_size, stat.st_mtime_ns, hash.hexdigest())
+    return files[path][2]
+
+def cached(kind, path, fn, *args, key=()):
+    """return fn(path, *args), reusing the output of a previous run if the content of path did not change.
+    key: anything else the output depends on"""
+    return cached_map(kind, [path], lambda path: fn(path, *args), key=(*args, *key))[0]
+
+def cached_map(kind, paths, fn, map_fn=map, key=()):
+    """same as list(map_fn(fn, paths)), but only compute the paths that changed since the last run"""
+    global n_hits, n_misses
+    if not enabled:
+        return list(map_fn(fn, paths))
+    results = [None] * len(paths)
+    todo = []
+    for i, path in enumerate(paths):
+        entry_key = (kind, str(path), *key)
+        entry = entries.get(entry_key)
+        if entry is not None and entry[0] == content_hash(path):
+            results[i] = entry[1]
+        else:
+            todo.append(i)
+    n_hits += len(paths) - len(todo)
+    n_misses += len(todo)
+    for i, output in zip(todo, map_fn(fn, [paths[i] for i in todo])):
+        entries[(kind, str(paths[i]), *key)] = (content_hash(paths[i]), output)
+        results[i] = output
+    return results
+
+def is_fresh(output_path, sources=(), key=()):
+    """True if output_path was written by a previous run from the exact same sources
+    (paths) and key (anything else), and was not modified since"""
+    global n_hits, n_misses
+    if not enabled:
+        return False
+    output = outputs.get(str(output_path))
+    try:
+        fresh = (output is not None
+                 and output[0] == (tuple(content_hash(s) for s in sources), key)
+                 and output[1] == stat_key(output_path))
+    except FileNotFoundError:
+        fresh = False
+    if fresh:
+        n_hits += 1
+    else:
+        n_misses += 1
+    return fresh
+
+def mark_fresh(output_path, sources=(), key=()):
+    """to call once output_path have been written from sources and key"""
+    if enabled:
+        outputs[str(output_path)] = ((tuple(content_hash(s) for s in sources), key), stat_key(output_path))
+
+def stat_key(path):
+    stat = Path(path).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+def write_if_changed(path, text):
+    """write text (str or bytes) to path, unless the file already have this exact content (according to the cache)"""
+    content = text if isinstance(text, bytes) else text.encode('utf-8')
+    key = hashlib.blake2b(content, digest_size=16).hexdigest()
+    if is_fresh(path, key=key):
+        return False
+    Path(path).parents[0].mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    profiling.add_bytes(written=len(content))
+    mark_fresh(path, key=key)
+    return True
@@ -0,0 +1,133 @@
+"""What changed since the catalogues of ./last_version/, for dump_infos (" (new!)" tagging and the changelog stage)
+
+changelog.json has, for each *_by_id catalogue having an old version:
+- added, removed: ids
+- changed: {id: {field: change}}, a change being
+  - {key: [old, new]} for dicts (e.g. the vehicle stats), only the differing keys
+  - {'added': [...], 'removed': [...]} for the sources
+  - [old, new] otherwise
+and, for the vehicles, their part list changes {id: {brick_id: difference in count}} from vehicle_parts.json.
+
+Everything is compared as plain json (the old files are only parsed, never turned back into dataclasses),
+each catalogue in a single pass over its ids. Names are compared without their " (new!)".
+"""
+
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+
+last_version_path = Path('last_version')
+new_suffix = ' (new!)'
+catalogues = ['brickpacks_by_id', 'bricks_by_id', 'stickers_by_id', 'assemblies_by_id', 'wheels_by_id',
+              'propellers_by_id', 'flairs_by_id', 'chassis_by_id', 'vehicles_by_id']
+
+old_values = {}  # name -> parsed last_version/<name>.json, or None
+
+
+def old_value(name):
+    """last_version/<name>.json, parsed once"""
+    if name not in old_values:
+        json_path = last_version_path / f'{name}.json'
+        if json_path.is_file():
+            with open(json_path, encoding='utf-8') as f:
+                old_values[name] = json.load(f)
+        else:
+            old_values[name] = None
+    return old_values[name]
+
+def is_new(name, id):
+    """if id is not in last_version/<name>.json (False if there is no such file)"""
+    old = old_value(name)
+    return old is not None and str(id) not in old
+
+def tagged(name, id, item_name):
+    return item_name + new_suffix if is_new(name, id) else item_name
+
+
+def without_new(entry):
+    if isinstance(entry, dict) and isinstance(entry.get('name'), str) and entry['name'].endswith(new_suffix):
+        return {**entry, 'name': entry['name'][:-len(new_suffix)]}
+    return entry
+
+def resolve_sources(entry, sources_table):
+    """entry with its sources indices (see dump_infos --normalize-sources) replaced by the sources"""
+    sources = entry.get('sources') if isinstance(entry, dict) else None
+    if sources_table is None or not sources or not isinstance(sources[0], int):
+        return entry
+    return {**entry, 'sources': [sources_table[i] for i in sources]}
+
+def canonical(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+def keys(old, new):
+    """the keys of new then the ones only in old"""
+    return list(new) + [k for k in old if k not in new]
+
+def diff_field(field, old, new):
+    if isinstance(old, dict) and isinstance(new, dict):
+        return {k: [old.get(k), new.get(k)] for k in keys(old, new) if old.get(k) != new.get(k)}
+    if field == 'sources' and isinstance(old, list) and isinstance(new, list):
+        old_sources = {canonical(s): s for s in old}
+        new_sources = {canonical(s): s for s in new}
+        return {'added': [s for k, s in new_sources.items() if k not in old_sources],
+                'removed': [s for k, s in old_sources.items() if k not in new_sources]}
+    return [old, new]
+
+def diff_entry(old, new):
+    return {field: diff_field(field, old.get(field), new.get(field))
+            for field in keys(old, new) if old.get(field) != new.get(field)}
+
+def diff_catalogue(old, new, old_sources=None, new_sources=None):
+    """{'added', 'removed', 'changed'} between two {id: entry} parsed from json"""
+    changed = {}
+    for id, entry in new.items():
+        if id in old:
+            old_entry = without_new(resolve_sources(old[id], old_sources))
+            entry = without_new(resolve_sources(entry, new_sources))
+            if old_entry != entry:
+                changed[id] = diff_entry(old_entry, entry)
+    return {
+        'added': [id for id in new if id not in old],
+        'removed': [id for id in old if id not in new],
+        'changed': changed,
+    }
+
+def diff_parts(old, new):
+    """{vehicle id: {brick_id: difference in count}} between two vehicle_parts.json, for the vehicles in both"""
+    old_parts = {v['id']: v['parts_and_colors'] for v in old}
+    changes = {}
+    for v in new:
+        if v['id'] in old_parts:
+            counts = Counter(brick for brick, color in v['parts_and_colors'])
+            counts.subtract(brick for brick, color in old_parts[v['id']])
+            if difference := {brick: n for brick, n in counts.items() if n}:
+                changes[v['id']] = difference
+    return changes
+
+def changelog(new_values, new_sources=None):
+    """the changelog.json content, new_values being {name: parsed json} of the catalogues (and vehicle_parts)"""
+    old_sources = old_value('sources')
+    log = {}
+    for name in catalogues:
+        if name in new_values and old_value(name) is not None:
+            log[name] = diff_catalogue(old_value(name), new_values[name], old_sources, new_sources)
+    if 'vehicles_by_id' in log and 'vehicle_parts' in new_values and old_value('vehicle_parts') is not None:
+        log['vehicles_by_id']['parts'] = diff_parts(old_value('vehicle_parts'), new_values['vehicle_parts'])
+    return log
+
+def summary(log):
+    return ', '.join(f"{name.removesuffix('_by_id')} +{len(d['added'])} -{len(d['removed'])} ~{len(d['changed'])}"
+                     for name, d in log.items())
+
+
+if __name__ == '__main__':
+    # compare the json files of the current directory (or of the given one) with the ones of ./last_version/
+    new_path = Path(sys.argv[1] if len(sys.argv) > 1 else '.')
+    new_values = {}
+    for name in catalogues + ['vehicle_parts', 'sources']:
+        if (new_path / f'{name}.json').is_file():
+            with open(new_path / f'{name}.json', encoding='utf-8') as f:
+                new_values[name] = json.load(f)
+    print(summary(changelog(new_values, new_values.get('sources'))))
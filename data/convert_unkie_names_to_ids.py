@@ -2,69 +2,94 @@ import csv
 import json
 from functools import cache
 
+from name_resolver import NameResolver, normalize
+
+path_in = "unkie/update 5 manually typed by burger/without_ids.csv"
+path_out = "unkie/update 5 manually typed by burger/with_ids.csv"
+not_found_id = 'XXXXXXXXXXXXXXXXXXXXXXXXXXXXXX'
+ambiguous_id = 'WWWWWWWWWWWWWWWWWWWWWWWWWWWWWW'
+approximate_id = 'AAAAAAAAAAAAAAAAAAAAAAAAAAAAAA'  # with keep_approximate=False
+
+store_data_for_subtab = {
+    'Street': 'vehicles_by_id.json',
+    'Off-Road': 'vehicles_by_id.json',
+    'Water': 'vehicles_by_id.json',
+    'Drivers': None,
+    'Flair': 'flairs_by_id.json',
+    'Stickers': 'stickers_by_id.json',
+    'Brick Packs': 'brickpacks_by_id.json',
+    'Engines': None,
+    'Horns': None,
+}
+terrain_for_subtab = {
+    'Street': 'Street',
+    'Off-Road': 'Offroad',
+    'Water': 'Boat',
+}
+id_for_name = {
+    'Tall Flag (Blue)': 'Flagpole_31079_Blue',  # could be 'Flagpole_31079_Blue' or 'Flagpole_31079'
+    'Sunset Track Racer': 'TrackRacer_31089',  # could be 'SportsCar_31089' (offroad) or 'TrackRacer_31089' (street)
+    'School Bus': 'SchoolBus_60329',  # could be 'SchoolBus_VC70423' (garage_valid: 'CostExceeded') or 'SchoolBus_60329' (license: "City")
+}
+
 @cache
 def read_json(path):
     with open(path, encoding='utf-8') as f:
         return json.load(f)
 
-path_in = "unkie/update 5 manually typed by burger/without_ids.csv"
-path_out = "unkie/update 5 manually typed by burger/with_ids.csv"
-with open(path_in, encoding='utf-8') as file_in, open(path_out, 'w', encoding='utf-8') as file_out:
-    for i_row, row in enumerate(csv.reader(file_in)):
-        if i_row == 0:  # ignore header
-            continue
-        tab, subtab, name, price, rarity = row
-        tab = ' '.join(tab.split(' ')[1:])
-        subtab = ' '.join(subtab.split(' ')[1:])
-        price = int(price)
-        rarity = int(rarity.split(' ')[0])
-        rarity = {
-            0: None,
-            1: 'Cool',
-            2: 'Awesome',
-            3: 'SuperAwesome'
-        }[rarity]
-        store_data_for_subtab = {
-            'Street': 'vehicles_by_id.json',
-            'Off-Road': 'vehicles_by_id.json',
-            'Water': 'vehicles_by_id.json',
-            'Drivers': None,
-            'Flair': 'flairs_by_id.json',
-            'Stickers': 'stickers_by_id.json',
-            'Brick Packs': 'brickpacks_by_id.json',
-            'Engines': None,
-            'Horns': None,
-        }
-        id_for_name = {
-            'Tall Flag (Blue)': 'Flagpole_31079_Blue',  # could be 'Flagpole_31079_Blue' or 'Flagpole_31079'
-            'Sunset Track Racer': 'TrackRacer_31089',  # could be 'SportsCar_31089' (offroad) or 'TrackRacer_31089' (street)
-            'School Bus': 'SchoolBus_60329',  # could be 'SchoolBus_VC70423' (garage_valid: 'CostExceeded') or 'SchoolBus_60329' (license: "City")
-        }
-        if tab == 'Store':
-            data_path = store_data_for_subtab[subtab]
-            if data_path is None:
+@cache
+def resolver(path):
+    return NameResolver(read_json(path).values(), overrides=id_for_name)
+
+def convert_lines(path_in=path_in, verbose=True, keep_approximate=True):
+    """the with_ids.csv lines (id, tab, subtab, price) of the without_ids.csv rows, using the current *_by_id.json
+    (the names only matched approximately get approximate_id unless keep_approximate, e.g. when nobody reviews them)"""
+    with open(path_in, encoding='utf-8') as file_in:
+        for i_row, row in enumerate(csv.reader(file_in)):
+            if i_row == 0:  # ignore header
                 continue
-            item_data = read_json(data_path)
-        elif tab == 'Official':
-            item_data = read_json('vehicles_by_id.json')
-        else:
-            raise NotImplemented(tab)
-        if item_data is not None:
-            items = [item for item in item_data.values() if name.lower() == item['name'].replace(' (new!)', '').lower().strip()]
-            if len(items) == 1:
-                id = items[0]['id']
-            elif not items:
+            tab, subtab, name, price, rarity = row
+            tab = ' '.join(tab.split(' ')[1:])
+            subtab = ' '.join(subtab.split(' ')[1:])
+            price = int(price)
+            rarity = int(rarity.split(' ')[0])
+            rarity = {
+                0: None,
+                1: 'Cool',
+                2: 'Awesome',
+                3: 'SuperAwesome'
+            }[rarity]
+            if tab == 'Store':
+                data_path = store_data_for_subtab[subtab]
+                if data_path is None:
+                    continue
+            elif tab == 'Official':
+                data_path = 'vehicles_by_id.json'
+            else:
+                raise NotImplementedError(tab)
+            fields = {'rarity': rarity}
+            if subtab in terrain_for_subtab:
+                fields['terrain'] = terrain_for_subtab[subtab]
+            ids, matched_names = resolver(data_path).resolve(name, **fields)
+            if len(ids) == 1:
+                id = ids[0]
+                if matched_names != [normalize(name)]:
+                    print(' | approximate match for item name', name, ':', matched_names[0])
+                    if not keep_approximate:
+                        id = approximate_id
+            elif not ids:
                 print(' | could not find item name', name)
-                id = 'XXXXXXXXXXXXXXXXXXXXXXXXXXXXXX'
+                id = not_found_id
             else:  # several matching items
-                if name in id_for_name:
-                    id = id_for_name[name]
-                elif len([item for item in items if rarity == item['rarity']]) == 1:
-                    items = [item for item in items if rarity == item['rarity']]
-                    id = items[0]['id']
-                else:
-                    print(' | ambiguous id for item name', name, ': can be')
-                    print(*items, sep='\n')
-                    id = 'WWWWWWWWWWWWWWWWWWWWWWWWWWWWWW'
-        print(tab, subtab, name, price, rarity, id, sep=', ')
-        print(id, tab, subtab, price, sep=', ', file=file_out)
\ No newline at end of file
+                print(' | ambiguous id for item name', name, ': can be')
+                print(*[read_json(data_path)[id] for id in ids], sep='\n')
+                id = ambiguous_id
+            if verbose:
+                print(tab, subtab, name, price, rarity, id, sep=', ')
+            yield ', '.join(map(str, (id, tab, subtab, price)))
+
+
+if __name__ == '__main__':
+    with open(path_out, 'w', encoding='utf-8') as file_out:
+        for line in convert_lines():
+            print(line, file=file_out)
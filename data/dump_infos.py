@@ -35,77 +35,175 @@ Before running this, you want to dump the following folders (relative to base_pa
 - uasset:
   - Game/Vehicle/Configs/BrickGraphs
 
-You can also copy your old ./data/*_by_id.json to ./data/last_version/ if you want
-the new ones to have " (new!)" appended to their names
+You can also copy your old ./data/*_by_id.json (and vehicle_parts.json) to ./data/last_version/
+if you want the new ones to have " (new!)" appended to their names, and a changelog.json
+of what was added, removed and changed
+
+With --locales fr,de (needs Localization/*/<lang>/*.locres exported to json), the names of
+each *_by_id.json are also written to *_by_id.fr.json and *_by_id.de.json, from the same parse
+
+Everything is split into stages, see --help for the list and --only to rebuild a few of them.
+Parsed exports, textures and dumps are tracked in ./data/.build_cache/ so that
+unchanged inputs are not re-parsed, re-copied or re-written (see --no-cache).
+--profile out.json reports where the time goes, per stage and per helper, --speedscope out.json shows it
+on a timeline (see profiling.py)
 """
 
-from dataclasses import dataclass, asdict, is_dataclass
+from dataclasses import dataclass, asdict, fields, is_dataclass, replace
 from collections import defaultdict, Counter
 from itertools import chain
-from typing import Optional, Any
+from functools import partial
+from typing import Optional, Callable
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import json
 import csv
 from pathlib import Path
-from os.path import basename
+from os.path import basename, getsize
 from glob import glob
-import filecmp
-from shutil import copy as _copy
 from urllib.parse import quote as escape
 
+import build_cache
+import changelog
+import profiling
+import usage_index
+import ue_json
+import brick_catalogue
+import alias_resolver
+from alias_resolver import AliasResolver
+import string_tables
+import texture_jobs
+import sprite_atlas
+from search_index import build_search_index
+import convert_unkie_names_to_ids as unkie_ids  # the Unkie store prices, typed by hand
 from vehicle_parts import parse_vehicle_parts  # straight from binary
 from surplus_v2 import vehicle_surplus  # could have done it here
 from list_properties import list_properties  # just a helper to print what to parse
 
 try:
-    from PIL import Image
-    from sticker_uv_mapping import uv_map_pil
+    import sticker_uv_mapping  # only to check its dependencies are there, see texture_jobs
     do_uv_map = True
 except ImportError as e:
     print('/!\ WARNING /!\: numpy/scipy/pillow not found. skipping the sticker uv transformations...', e.msg)
     do_uv_map = False
 
+try:
+    import parts_table
+except ImportError as e:
+    print('/!\ WARNING /!\: numpy not found. skipping the columnar vehicle_parts...', e.msg)
+    parts_table = None
+
 
 base_path = "../Exports/LEGO2KDrive/Content/"
 brick_path = base_path + "LEGO/Bricks/"
+jobs = 1  # number of processes used to parse the vehicle brickgraphs and write the textures
+normalize_sources = False  # dump sources once in sources.json, and refer to them by index everywhere else
+writes_enabled = True  # False while running a stage only needed by another one, see run_stages()
+
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable
+    inputs: list[str]   # stages whose state this one needs
+    outputs: list[str]  # what it writes, for the --help
+
+stages = {}  # in declaration order, which is also a valid running order
+def stage(name, inputs=(), outputs=()):
+    def decorator(fn):
+        for input in inputs:
+            assert input in stages, f'stage {name} need {input}, which should be declared first'
+        stages[name] = Stage(name, fn, list(inputs), list(outputs))
+        return fn
+    return decorator
+
+def needed_stages(requested):
+    """requested stages and all their upstream stages, in running order"""
+    needed = set()
+    stack = list(requested)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(stages[name].inputs)
+    return [name for name in stages if name in needed]
+
+def run_stages(requested=None):
+    """run the requested stages (default: all of them).
+    Upstream stages are run too, to build the state needed downstream,
+    but they do not write any json (textures are only written by the textures stage)."""
+    global writes_enabled
+    requested = set(stages if requested is None else requested)
+    for name in needed_stages(requested):
+        writes_enabled = name in requested
+        if not writes_enabled:
+            print(f'-> Running stage {name} (only as an input)')
+        with profiling.stage(name):
+            stages[name].run()
+        profiling.end_stage(name)
+    writes_enabled = True
 
 
 
 def copy(src, dst, crop=False):
-    Path(dst).parents[0].mkdir(parents=True, exist_ok=True)
-    if crop:
-        from PIL import Image
-        image = Image.open(src)
-        image.crop(image.getbbox()).save(dst)
-    else:
-        # for speed, only copy if dst != src (according to filesystem metadata)
-        if not Path(dst).is_file() or not filecmp.cmp(src, dst):
-            _copy(src, dst)
+    """queue a texture copy (cropped to its content if crop), see the textures stage"""
+    texture_jobs.add('crop' if crop else 'copy', src, [dst])
 
 class EnhancedJSONEncoder(json.JSONEncoder):
     def default(self, o):
-        if is_dataclass(o):
-            return asdict(o)
+        if isinstance(o, Source) and source_indices is not None:
+            return source_indices[id(o)]
+        elif is_dataclass(o):
+            return shallow_asdict(o)
         elif isinstance(o, set):
             return list(o)
         else:
             return super().default(o)
 
+class PlainJSONEncoder(EnhancedJSONEncoder):
+    """without the sources indices"""
+    def default(self, o):
+        return shallow_asdict(o) if isinstance(o, Source) else super().default(o)
+
+def shallow_asdict(dataclass_):
+    """like asdict, but leave the nested dataclasses to EnhancedJSONEncoder (e.g. sources indices)"""
+    return {field.name: getattr(dataclass_, field.name) for field in fields(dataclass_)}
+
+@profiling.profiled('dump')
 def dump(name, value, add_new_to_name=True, verbose=True):
+    if not writes_enabled:
+        return
     json_path = f'./{name}.json'
+    untagged = value  # the translations do not get the native ' (new!)'
     new_count = 0
-    if add_new_to_name and (Path('last_version') / json_path).is_file():
-        with open(Path('last_version') / json_path) as old_file:
-            old_value = json.load(old_file)
+    if add_new_to_name and isinstance(value, dict) and changelog.old_value(name) is not None:
+        value = dict(value)  # tag shallow copies, the parsed items keep their names
         for k, v in value.items():
-            if str(k) not in old_value:
-                v.name += ' (new!)'
+            if is_dataclass(v) and changelog.is_new(name, k):
+                value[k] = replace(v, name=v.name + changelog.new_suffix)
                 new_count += 1
-    Path(json_path).parents[0].mkdir(parents=True, exist_ok=True)
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(value, f, cls=EnhancedJSONEncoder, ensure_ascii=False)
+    build_cache.write_if_changed(json_path, json.dumps(value, cls=EnhancedJSONEncoder, ensure_ascii=False))
     if verbose:
         print('-> Dumped', len(value), name
               + (f' ({new_count} new!)' if new_count else ''))
+    if name.endswith('_by_id'):
+        dump_translations(name, untagged)
+
+def dump_translations(name, value):
+    """<name>.<locale>.json for each extra locale: {id: {field: translation}} of the LocalizedName fields"""
+    if not string_tables.locales[1:]:
+        return
+    for locale in string_tables.locales[1:]:
+        overlay = {}
+        for k, v in value.items():
+            fields_ = shallow_asdict(v) if is_dataclass(v) else v
+            names = {field: s.translate(locale) for field, s in fields_.items()
+                     if isinstance(s, string_tables.LocalizedName)}
+            if names:
+                overlay[k] = names
+        build_cache.write_if_changed(f'./{name}.{locale}.json', json.dumps(overlay, ensure_ascii=False))
+    print(f' | and their names in {", ".join(string_tables.locales[1:])}')
         
 def proper_sort_dict(dict_):
     return dict(sorted(dict_.items(), key=lambda kv: proper_order(kv[1].name)))
@@ -125,15 +223,15 @@ def invert_zip(args):
     return zip(*args)
 
 
+@profiling.profiled('load')
 def load(paths, exclude_paths="", exclude_prefix=['T_', 't_', 'SM_', 'LPG_'],
          type="", key="Properties", remove_type_prefix=True,
          n_per_file=1, rename_ids={}):
-    for path in set(glob(paths, recursive=True)) - set(glob(exclude_paths, recursive=True)):
+    for path in sorted(set(glob(paths, recursive=True)) - set(glob(exclude_paths, recursive=True))):
         if any(Path(path).stem.startswith(prefix) for prefix in exclude_prefix):
             continue
         id = Path(path).stem
-        with open(path, encoding='utf-8') as f:
-            json_dicts = [uecomponent for uecomponent in json.load(f) if uecomponent["Type"] == type]
+        json_dicts = build_cache.cached('load', path, read_components, type)
         if n_per_file is not None:
             assert len(json_dicts) == n_per_file, f'found {len(json_dicts)} {type} in file {id}, expected {n_per_file}'
         for uecomponent in json_dicts:
@@ -148,6 +246,11 @@ def load(paths, exclude_paths="", exclude_prefix=['T_', 't_', 'SM_', 'LPG_'],
             properties = uecomponent[key]
             yield id, properties, original_id
 
+def read_components(path, type):
+    if profiling.enabled:
+        profiling.add_bytes(read=getsize(path))
+    return ue_json.load_components(path, type)
+
 # NB: localizations are in .../<lang>/<Game or UpdateN>.locres -> json[0]["StringTable"]["KeysToMetaData"]["StringTable_VehicleParts"]["Vehicle_Name.<key>"]
 
 def try_parse(properties, key, default=None, required=False):
@@ -168,28 +271,13 @@ def try_parse(properties, key, default=None, required=False):
     else:
         return properties[key]
 
-string_tables = {}
+@profiling.profiled('get_name')
 def get_name(properties, key=None, default=None, required=False):
     name_property = properties if key is None else try_parse(properties, key, required=required)
     if name_property is None:  # reached only if not requiered, otherwise
         return default         # try_parse would have raised an exception
     if 'TableId' in name_property and 'Key' in name_property:
-        table_id = name_property['TableId']
-        key = name_property['Key']
-        if table_id not in string_tables:
-            string_table_file = table_id.replace('/Game/', '', 1).split('.')[0] + '.json'
-            assert table_id.count('.') <= 1, f'need better extension remover code for {table_id}'
-            try:
-                with open(base_path + string_table_file) as f:
-                    string_tables[table_id] = json.load(f)[0]['StringTable']['KeysToMetaData']
-            except FileNotFoundError as e:
-                e.args = (*e.args, 'maybe you forgot to dump the game files from the new update(s)?', string_table_file)
-                raise(e)
-        try:
-            return string_tables[table_id][key]
-        except KeyError as e:
-            e.args = (*e.args, 'maybe you forgot to re-dump the game files from the new update(s)?', table_id.replace('/Game/', '', 1).split('.')[0] + '.json')
-            raise(e)
+        return string_tables.localized(name_property['TableId'], name_property['Key'])
     elif 'CultureInvariantString' in name_property:
         return name_property['CultureInvariantString']
     elif 'LocalizedString' in name_property:
@@ -218,6 +306,21 @@ class Source:
 
 Source.default = Source('default', 'Unlocked by default!', None, {})
 
+source_indices = None  # id(source) -> index in the sources table, when normalize_sources
+def index_sources():
+    """deduplicate all the sources into a table, and map each Source object to its index"""
+    global source_indices
+    table = []
+    index_for_key = {}
+    source_indices = {}
+    for source in all_sources + [Source.default]:
+        key = json.dumps(asdict(source), ensure_ascii=False)
+        if key not in index_for_key:
+            index_for_key[key] = len(table)
+            table.append(source)
+        source_indices[id(source)] = index_for_key[key]
+    return table
+
 biomes = ['Turbo Acres', 'Big Butte', 'Frontier Valley', 'Haunts', 'Ice']  # found in Data/RewardsTable/CollectiblesRewardsTable.json or Data/RewardsTable/RaceRewardsTable.json
 def get_biome(in_string, default=None, required=False):
     if not in_string:
@@ -307,14 +410,31 @@ def parse_sources(verbose=False):
             all_sources.append(Source(type.lower(), name, biome, rewards))
             for reward in rewards:
                 sources_for_any_id[reward].append(all_sources[-1])
-    with open("unkie/update 5 manually typed by burger/with_ids.csv", encoding='utf-8') as f:
-        for row in csv.reader(f):
-            id, tab, subtab, price = row
-            all_sources.append(Source('unkie_permanent', f'{tab}: {subtab.strip()}: {price}Brickbux', None, {id: 1}))
-            sources_for_any_id[id].append(all_sources[-1])
-parse_sources()
-#dump("sources", all_sources)  # defered for adding brickpacks
-#dump("sources_for_any_id", sources_for_any_id)  # defered for adding brickpacks
+    for row in unkie_rows():
+        id, tab, subtab, price = row
+        if id in (unkie_ids.not_found_id, unkie_ids.ambiguous_id, unkie_ids.approximate_id):
+            problem = {unkie_ids.not_found_id: 'not found', unkie_ids.ambiguous_id: 'ambiguous',
+                       unkie_ids.approximate_id: 'only matched approximately'}[id]
+            print(f' | skipping an Unkie store item whose name was {problem}: {tab.strip()}: {subtab.strip()}: {price.strip()}Brickbux')
+            continue
+        all_sources.append(Source('unkie_permanent', f'{tab}: {subtab.strip()}: {price}Brickbux', None, {id: 1}))
+        sources_for_any_id[id].append(all_sources[-1])
+
+def unkie_rows():
+    """the rows of with_ids.csv, or if it has not been written yet, the names of without_ids.csv
+    resolved to ids as convert_unkie_names_to_ids.py would (from the previous *_by_id.json), without the
+    approximate matches since nobody reviewed them"""
+    if Path(unkie_ids.path_out).is_file():
+        with open(unkie_ids.path_out, encoding='utf-8') as f:
+            return list(csv.reader(f))
+    print(f' | no {unkie_ids.path_out}, resolving the item names of {unkie_ids.path_in}')
+    return list(csv.reader(unkie_ids.convert_lines(verbose=False, keep_approximate=False)))
+
+@stage('sources')
+def sources_stage():
+    parse_sources()
+    #dump("sources", all_sources)  # defered for adding brickpacks
+    #dump("sources_for_any_id", sources_for_any_id)  # defered for adding brickpacks
 
 # TODO: check for supplementary mission reward at LEGO2KDrive/Content/Data/MissionData/LD_Desert
 
@@ -375,21 +495,28 @@ def parse_brickpacks():
         brickpacks.append(BrickPack(id, name, rarity, bricks, chassis, assemblies, wheels, sources))
         brickpacks_by_id[id] = brickpacks[-1]
 
-parse_brickpacks()
-#dump('brickpacks', brickpacks)
-brickpacks_by_id = proper_sort_dict(brickpacks_by_id)
-dump('brickpacks_by_id', brickpacks_by_id)
-
 def add_brickpacks_to_sources():
     for pack in brickpacks:
         rewards = {id: 1 for id in pack.bricks + pack.chassis + pack.assemblies + pack.wheels}
         all_sources.append(Source('brickpack', pack.id, None, rewards))
         for reward in rewards:
             sources_for_any_id[reward].append(all_sources[-1])
-add_brickpacks_to_sources()
-#print(all_sources)
-dump("sources", all_sources)
-dump("sources_for_any_id", sources_for_any_id)
+
+@stage('brickpacks', inputs=['sources'],
+       outputs=['brickpacks_by_id', 'sources', 'sources_for_any_id'])
+def brickpacks_stage():
+    global brickpacks_by_id
+    parse_brickpacks()
+    #dump('brickpacks', brickpacks)
+    brickpacks_by_id = proper_sort_dict(brickpacks_by_id)
+    dump('brickpacks_by_id', brickpacks_by_id)
+    add_brickpacks_to_sources()
+    #print(all_sources)
+    if normalize_sources:
+        dump("sources", [asdict(source) for source in index_sources()])
+    else:
+        dump("sources", all_sources)
+    dump("sources_for_any_id", sources_for_any_id)
 
 
 
@@ -406,24 +533,27 @@ class Brick:
     sources: list
 
 def check_brick_icon_path(id, properties):
+    """path of the brick icon, or None if it has none"""
     if 'Icon' in properties:
         if properties["Icon"]["AssetPathName"] != f"/Game/LEGO/Bricks/T_{id}_Icon.T_{id}_Icon":
             print(f'brick {id} icon path differ from its id: {properties["Icon"]["AssetPathName"]}')
             other_id = int(properties["Icon"]["AssetPathName"].split('_')[-2])
-            copy(brick_path + f"T_{other_id}_Icon.png", brick_path + f"T_{id}_Icon.png")
-            print(f' | copyied {brick_path + f"T_{other_id}_Icon.png"} to {brick_path + f"T_{id}_Icon.png"}')
-        return True
+            print(f' | using {brick_path + f"T_{other_id}_Icon.png"} instead')
+            return brick_path + f"T_{other_id}_Icon.png"
+        return brick_path + f"T_{id}_Icon.png"
     else:
         #print('brick', id, f'have no icon path')
         if Path(brick_path + f"T_{id}_Icon.png").is_file():
             print(' | but icon exists anyway')
-            return True
+            return brick_path + f"T_{id}_Icon.png"
         else:
-            return False
+            return None
 
 bricks = []
 bricks_by_id = {}
 brick_aliases = {}
+alias_table = None  # AliasResolver of the bricks, see map_aliases
+brick_icon_paths = {}
 def parse_bricks():
     for id, properties, oid in load(brick_path + "*.json", type='LegoPart'):
         id = int(id)
@@ -432,9 +562,11 @@ def parse_bricks():
         aliases = try_parse(properties, "Aliases", [])
         if id in aliases:
             aliases.remove(id)
-        no_image = not check_brick_icon_path(id, properties)
+        icon_path = check_brick_icon_path(id, properties)
+        no_image = icon_path is None
         if not no_image:
-            copy(brick_path + f"T_{id}_Icon.png", f'../textures/bricks/{id}.png')
+            copy(icon_path, f'../textures/bricks/{id}.png')
+            brick_icon_paths[id] = icon_path
         size = try_parse(properties, "GridSize", required=True)
         size = (size['X'], size['Y'], size['Z'])
         weight = try_parse(properties, "Mass", required=True)
@@ -449,47 +581,37 @@ def parse_bricks():
         bricks_by_id[brick.id] = brick
 
 def map_aliases():
+    global alias_table
+    alias_table = AliasResolver({brick.id: brick.aliases for brick in bricks},
+                                in_brick_pack=[brick.id for brick in bricks if not brick.is_surplus])
     # simple one-way alias->id mapping
-    for brick in bricks:
-        brick_aliases[brick.id] = brick.id
-        for alias in brick.aliases:
-            if alias not in brick_aliases:  # priority for the brick with the id
-                brick_aliases[alias] = brick.id
+    brick_aliases.update(alias_table.brick_aliases)
     
-    # recursivelly propagate aliases bidirectionally
-    graph = {id: set(bricks_by_id[id].aliases) - set([id]) for id in bricks_by_id}
-    aliases_groups = {}
+    # aliases propagated bidirectionally
+    for group in alias_table.all_groups():
+        if len([alias for alias in group if alias in bricks_by_id and bricks_by_id[alias].sources]) > 1:
+            print(group, {id: bricks_by_id[id].sources for id in group if id in bricks_by_id})
     for brick in bricks:
-        if brick.id not in aliases_groups:
-            group = dfs(graph, brick.id)
-            for id in group:
-                aliases_groups[id] = group
-            if len([alias for alias in group if alias in bricks_by_id and bricks_by_id[alias].sources]) > 1:
-                print(group, {id: bricks_by_id[id].sources for id in group if id in bricks_by_id})
-        brick.aliases = sorted(aliases_groups[brick.id] - set([brick.id]))
-
-def dfs(graph: dict[Any, set], start):
-    visited = set()
-    stack = [start]
-    while stack:
-        vertex = stack.pop()
-        if vertex not in visited:
-            visited.add(vertex)
-            if vertex not in graph:
-                #print('neighbor', vertex, 'not in the graph; adding it')
-                graph[vertex] = set()
-            stack.extend(graph[vertex] - visited)
-    return visited
-
-parse_bricks()
-map_aliases()
-
-    
-    
-# dump('bricks', bricks)  # deferred to later
-# dump('bricks_by_id', bricks_by_id)  # "
-dump('brick_aliases', brick_aliases)
-print(f'-> Found {len([b for b in bricks if b.is_surplus])} surplus-eligible bricks!')
+        brick.aliases = [alias for alias in alias_table.group(brick.id) if alias != brick.id]
+
+@stage('bricks', inputs=['brickpacks'], outputs=['brick_aliases'])
+def bricks_stage():
+    parse_bricks()
+    map_aliases()
+    # dump('bricks', bricks)  # deferred to the usage stage
+    # dump('bricks_by_id', bricks_by_id)  # "
+    dump('brick_aliases', brick_aliases)
+    print(f'-> Found {len([b for b in bricks if b.is_surplus])} surplus-eligible bricks!')
+
+@stage('atlas', inputs=['bricks'], outputs=['brick_atlas', '../textures/bricks/_atlas/*'])
+def atlas_stage():
+    """brick icons sprite sheets, in the bricks list order (see fetch_bricks in load.js)"""
+    atlas = sprite_atlas.build_atlas(
+        [(brick.id, brick_icon_paths[brick.id]) for brick in bricks_by_id.values() if brick.id in brick_icon_paths],
+        '../textures/bricks/_atlas', 'textures/bricks/_atlas', jobs=jobs
+    )
+    dump('brick_atlas', atlas, add_new_to_name=False, verbose=False)
+    print('-> Dumped brick_atlas of', len(atlas['icons']), 'icons in', len(atlas['sheets']), 'sheets')
 
 
 
@@ -517,8 +639,11 @@ def parse_stat_archetypes():
             sources.append(Source.default)
         stat_archetypes.append(StatArchetype(id, name, stats, rarity, price, sources))
         stat_archetypes_by_id[id] = stat_archetypes[-1]
-parse_stat_archetypes()
-dump('stat_archetypes', stat_archetypes)
+
+@stage('archetypes', inputs=['brickpacks'], outputs=['stat_archetypes'])
+def archetypes_stage():
+    parse_stat_archetypes()
+    dump('stat_archetypes', stat_archetypes)
 
 
 #list_properties(base_path + 'Garage/LegoAssets/Stickers/*.json', detail=['DecorationType', 'bIsGarageAsset', 'Material', 'bCanMirror'])
@@ -550,26 +675,27 @@ def parse_stickers():
         if 'Grease_Monkey_Sign.png' in image_path:
             continue  # dev test sticker, let's skip it
         if do_uv_map and ('UVOffset' in properties or 'UVScale' in properties):
-            new_image_path = Path(image_path).parent / '{id}.png'
             id = Path(image_path).stem + '/' + id
             name = Path(image_path).stem + '/' + name
             def xy(a): return a['X'], a['Y']
             u1, v1 = xy(properties['UVOffset']) if 'UVOffset' in properties else (0, 0)
             us, vs = xy(properties['UVScale']) if 'UVScale' in properties else (1, 1)
             u1, v1, us, vs = (float(e) for e in (u1, v1, us, vs))
-            image = Image.open(image_path)
-            uv_map_pil(image, u1, v1, us, vs).save(new_image_path)
-            copy(new_image_path, f'../textures/stickers/{id}.png')
-            copy(new_image_path, f'../textures/stickers/_/{id.replace("/", "_")}.png')
+            out_paths = [f'../textures/stickers/{id}.png', f'../textures/stickers/_/{id.replace("/", "_")}.png']
+            texture_jobs.add('uv', image_path, out_paths, args=(u1, v1, us, vs))
         else:
             copy(image_path, f'../textures/stickers/{id}.png')
         sources = sources_for_any_id.get(oid, [])
         if try_parse(properties, "AlwaysUnlocked", False):
             sources.append(Source.default)
         stickers_by_id[id] = Sticker(id, name, rarity, can_mirror, sources)
-parse_stickers()
-stickers_by_id = proper_sort_dict(stickers_by_id)
-dump('stickers_by_id', stickers_by_id)
+
+@stage('stickers', inputs=['brickpacks'], outputs=['stickers_by_id'])
+def stickers_stage():
+    global stickers_by_id
+    parse_stickers()
+    stickers_by_id = proper_sort_dict(stickers_by_id)
+    dump('stickers_by_id', stickers_by_id)
 
 
 
@@ -620,15 +746,20 @@ def parse_propellers():
     for id, properties, oid in load(base_path + "LEGO/Propeller/*.json", type='LegoPropellerAssembly'):
         assembly = parse_assembly(id, properties, oid, '../textures/propellers/')
         propellers_by_id[id] = Propeller(**assembly.__dict__)
-parse_assemblies()
-parse_wheels()
-parse_propellers()
-assemblies_by_id = proper_sort_dict(assemblies_by_id)
-wheels_by_id     = proper_sort_dict(wheels_by_id)
-propellers_by_id = proper_sort_dict(propellers_by_id)
-dump('assemblies_by_id', assemblies_by_id)
-dump('wheels_by_id', wheels_by_id)
-dump('propellers_by_id', propellers_by_id)
+
+@stage('assemblies', inputs=['brickpacks'],
+       outputs=['assemblies_by_id', 'wheels_by_id', 'propellers_by_id'])
+def assemblies_stage():
+    global assemblies_by_id, wheels_by_id, propellers_by_id
+    parse_assemblies()
+    parse_wheels()
+    parse_propellers()
+    assemblies_by_id = proper_sort_dict(assemblies_by_id)
+    wheels_by_id     = proper_sort_dict(wheels_by_id)
+    propellers_by_id = proper_sort_dict(propellers_by_id)
+    dump('assemblies_by_id', assemblies_by_id)
+    dump('wheels_by_id', wheels_by_id)
+    dump('propellers_by_id', propellers_by_id)
 
 
 
@@ -667,9 +798,22 @@ def parse_flairs():
         
         flairs_by_id[id] = Flair(**assembly.__dict__, rarity=rarity, garage_cost=garage_cost)
 
-parse_flairs()
-flairs_by_id = proper_sort_dict(flairs_by_id)
-dump('flairs_by_id', flairs_by_id)
+
+@stage('flairs', inputs=['brickpacks'], outputs=['flairs_by_id'])
+def flairs_stage():
+    global flairs_by_id
+    parse_flairs()
+    flairs_by_id = proper_sort_dict(flairs_by_id)
+    dump('flairs_by_id', flairs_by_id)
+
+
+
+@stage('textures', inputs=['brickpacks', 'bricks', 'stickers', 'assemblies', 'flairs'],
+       outputs=['../textures/*', 'texture_variants'])
+def textures_stage():
+    """write the textures queued by copy() and the sticker uv mappings, in parallel,
+    and their smaller variants for the website tiles"""
+    dump('texture_variants', texture_jobs.run(jobs), add_new_to_name=False, verbose=False)
 
 
 # TODO
@@ -714,8 +858,11 @@ def parse_chassis():
         terrain = terrain_candidates[0]
         
         chassis_by_id[id] = Chassis(id, name, terrain, stats, default_engine)
-parse_chassis()
-dump('chassis_by_id', chassis_by_id)
+
+@stage('chassis', outputs=['chassis_by_id'])
+def chassis_stage():
+    parse_chassis()
+    dump('chassis_by_id', chassis_by_id)
 
 
 
@@ -745,6 +892,17 @@ class VehicleParts:
     name: str
     parts_and_colors: list
 
+def parallel_map(fn, items, jobs=1):
+    if jobs > 1 and len(items) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            return list(pool.map(fn, items, chunksize=8))
+    return list(map(fn, items))
+
+def parse_perk(properties):
+    perk = try_parse(properties, 'VehiclePerk')
+    return perk.split('Perk_')[1].removesuffix("_C") if perk is not None else None
+
+vehicle_configs_path = base_path + "Game/Vehicle/Configs/VehicleConfig_*.json"
 vehicles = []
 vehicles_by_id = {}
 vehicle_parts = []
@@ -752,15 +910,29 @@ v_ids_for_name = defaultdict(list)
 brick_usage = {}
 weights = {}
 def parse_vehicles():
-    for id, properties, oid in load(base_path + "Game/Vehicle/Configs/VehicleConfig_*.json", type='VehicleConfig'):
+    configs = list(load(vehicle_configs_path, type='VehicleConfig'))
+    brickgraph_paths = []
+    for id, properties, oid in configs:
+        assert id == Path(properties['PartGraph']['ObjectPath']).stem
+        brickgraph_paths.append(base_path + "Game/Vehicle/Configs/BrickGraphs/" + id + '.uexp')
+    
+    # the brickgraphs are by far the slowest part, and independent from each other:
+    # parse them in worker processes, then merge everything else here, in order
+    # (only the ones that changed since the last run, the results also depend on the known brick ids)
+    parse_brickgraph = partial(parse_vehicle_parts, verbose=0)
+    all_parts_and_colors = build_cache.cached_map(
+        'brickgraph', brickgraph_paths, parse_brickgraph,
+        map_fn=profiling.mapped('parse_vehicle_parts', partial(parallel_map, jobs=jobs), read=getsize),
+        key=(build_cache.value_hash(sorted(brick_catalogue.get().ids_or_aliases)),)
+    )
+    
+    weight_table = alias_table.per_part({brick.id: brick.weight for brick in bricks})
+    for (id, properties, oid), parts_and_colors in zip(configs, all_parts_and_colors):
         #print(id)
         name = get_name(properties, "VehicleName", required=True)
         v_ids_for_name[name].append(id)
         rarity = try_parse(properties, "Rarity")
-            
-        assert id == Path(properties['PartGraph']['ObjectPath']).stem
-        brickgraph_path = base_path + "Game/Vehicle/Configs/BrickGraphs/" + id + '.uexp'
-        parts_and_colors = parse_vehicle_parts(brickgraph_path, verbose=0)
+        
         parts = [p for (p, c) in parts_and_colors]
         colors = [c for (p, c) in parts_and_colors]
         surplus_parts = vehicle_surplus(parts)
@@ -770,11 +942,14 @@ def parse_vehicles():
                 brick_usage[brick_id] = set()
             brick_usage[brick_id].add(id)
         
-        weight_estimation = sum(bricks_by_id[brick_aliases[i]].weight for i in parts)
+        weight_estimation = alias_resolver.total(weight_table, parts)
         for i, threeshold in enumerate((1250, 2500, 4800, 8000, 11000, float('inf'))):
             if weight_estimation < threeshold:
                 weight_class_estimation = i
                 break
+        else:  # not comparable, should not happen since unknown parts weigh 0
+            print(' | could not estimate the weight class of', id, 'weighting', weight_estimation)
+            weight_class_estimation = None
         weights[id] = (weight_estimation, weight_class_estimation)
         
         chassis = try_parse(properties, 'ChassisConfig', required=True).replace('ChassisConfig_', '', 1)
@@ -782,8 +957,7 @@ def parse_vehicles():
         terrain = chassis_by_id[chassis].terrain
         engine = try_parse(properties, 'EngineConfig') or chassis_by_id[chassis].default_engine
         horn = try_parse(properties, 'HornOverride')  # TODO: find default horn
-        perk = try_parse(properties, 'VehiclePerk')
-        if perk is not None: perk = perk.split('Perk_')[1].removesuffix("_C")
+        perk = parse_perk(properties)
         stat_archetype = try_parse(properties, 'StatArchetype')
         archetype_stats = stat_archetypes_by_id[stat_archetype].stats if stat_archetype is not None \
                           else {"TopSpeed": 0, "Acceleration": 0, "Handling": 0, "Health": 0}
@@ -805,33 +979,173 @@ def parse_vehicles():
         vehicle_parts.append(VehicleParts(id, name, parts_and_colors))
         dump(
             'vehicle_parts/' + id,
-            asdict(vehicles[-1]) | {'parts_and_colors': parts_and_colors},
+            shallow_asdict(vehicles[-1]) | {'parts_and_colors': parts_and_colors},
             verbose=False
         )
     #todo: poids, "bDriverNeedsHeadgearOverride": false,
 
-parse_vehicles()
-dump('v_ids_for_name', v_ids_for_name)
-
-vehicles, vehicle_parts = proper_sort_lists(vehicles, vehicle_parts)
-vehicles_by_id = {v.id: v for v in vehicles}
-brick_usage = {id: sorted(u, key=proper_order) for id, u in brick_usage.items()}
-#dump('vehicles', vehicles)
-dump('vehicles_by_id', vehicles_by_id)
-dump('vehicle_parts', vehicle_parts)
-
-dump('brick_usage', brick_usage)
-
 
-for brick in bricks:
-    dump(
-        f'brick_usage/{brick.id}',
-        asdict(brick) | {'usage': brick_usage.get(brick.id, [])},
-        verbose=False
+@stage('vehicles', inputs=['bricks', 'archetypes', 'chassis'],
+       outputs=['v_ids_for_name', 'vehicles_by_id', 'vehicle_parts', 'vehicle_parts/*', 'vehicle_parts_columns/*'])
+def vehicles_stage():
+    global vehicles, vehicle_parts, vehicles_by_id, brick_usage
+    parse_vehicles()
+    dump('v_ids_for_name', v_ids_for_name)
+    
+    vehicles, vehicle_parts = proper_sort_lists(vehicles, vehicle_parts)
+    vehicles_by_id = {v.id: v for v in vehicles}
+    brick_usage = {id: sorted(u, key=proper_order) for id, u in brick_usage.items()}
+    #dump('vehicles', vehicles)
+    dump('vehicles_by_id', vehicles_by_id)
+    dump('vehicle_parts', vehicle_parts)
+    dump_parts_table()
+
+def dump_parts_table():
+    """vehicle_parts, as the columns read by parts_table.PartsTable"""
+    if not writes_enabled or parts_table is None:
+        return
+    columns = parts_table.columns([v.parts_and_colors for v in vehicle_parts])
+    for column, array in columns.items():
+        build_cache.write_if_changed(parts_table.table_path / f'{column}.npy', parts_table.npy_bytes(array))
+    build_cache.write_if_changed(parts_table.table_path / 'vehicle_ids.json', json.dumps([v.id for v in vehicle_parts]))
+    print('-> Dumped', len(columns['brick_id']), 'parts of', len(vehicle_parts), 'vehicles to', parts_table.table_path)
+
+
+
+brick_summary_fields = ['id', 'name', 'size', 'weight', 'n_usage', 'is_surplus', 'no_image', 'aliases']
+brick_shard_size = 256
+def dump_brick_catalogue():
+    """bricks_by_id, but paged for the bricks list:
+    - bricks/summary.json: what is needed to draw and search the brick tiles, as one array per field
+    - bricks/<n>.json: the other fields of the bricks summary['id'][n*shard_size : (n+1)*shard_size]"""
+    all_bricks = list(bricks_by_id.values())
+    summary = {'shard_size': brick_shard_size}
+    for field in brick_summary_fields:
+        summary[field] = [getattr(brick, field) for brick in all_bricks]
+    summary['name'] = [changelog.tagged('bricks_by_id', brick.id, brick.name) for brick in all_bricks]
+    dump('bricks/summary', summary, add_new_to_name=False)
+    detail_fields = [field.name for field in fields(Brick) if field.name not in brick_summary_fields]
+    for n, start in enumerate(range(0, len(all_bricks), brick_shard_size)):
+        shard = {
+            brick.id: {field: getattr(brick, field) for field in detail_fields}
+            for brick in all_bricks[start : start + brick_shard_size]
+        }
+        dump(f'bricks/{n}', shard, add_new_to_name=False, verbose=False)
+
+@stage('usage', inputs=['bricks', 'vehicles'],
+       outputs=['brick_usage', 'brick_usage_index(.bin)', 'bricks_by_id', 'bricks/*'])
+def usage_stage():
+    dump('brick_usage', brick_usage)
+    dump_usage_index()
+    
+    for brick in bricks:
+        if brick.id in brick_usage:
+            brick.n_usage = len(brick_usage[brick.id])
+        else:
+            brick.n_usage = 0
+    #dump('bricks', bricks)
+    dump('bricks_by_id', bricks_by_id)
+    dump_brick_catalogue()
+
+def dump_usage_index():
+    """brick_usage as a sparse row index, from which the brick page only fetch its row"""
+    if not writes_enabled:
+        return
+    header, indices = usage_index.build(brick_usage, list(vehicles_by_id))
+    dump(usage_index.index_name, header, add_new_to_name=False, verbose=False)
+    build_cache.write_if_changed(f'./{usage_index.index_name}.bin', indices)
+    print('-> Dumped', usage_index.index_name, 'of', len(header['brick_ids']), 'bricks')
+
+
+
+def vehicle_search_keys():
+    """(id, name, perk) of the vehicles in the vehicles_by_id order, only from their configs
+    (no brickgraph parse) if the vehicles stage did not run"""
+    if vehicles_by_id:
+        return [(id, v.name, v.perk) for id, v in vehicles_by_id.items()]
+    keys = [(id, get_name(properties, "VehicleName", required=True), parse_perk(properties))
+            for id, properties, oid in load(vehicle_configs_path, type='VehicleConfig')]
+    return sorted(keys, key=lambda key: proper_order(key[1]))
+
+@stage('search', inputs=['bricks', 'stickers', 'assemblies', 'flairs'], outputs=['search_index'])
+def search_stage():
+    """what the website search bar looks into, in the order index.js displays the tiles"""
+    name = lambda category, id, item: changelog.tagged(f'{category}_by_id', id, item.name)  # as in the dumps
+    names = lambda category, by_id: [(id, [name(category, id, item)]) for id, item in by_id.items()]
+    categories = {
+        'vehicles': [(id, [changelog.tagged('vehicles_by_id', id, v_name)] + ([perk] if perk is not None else []))
+                     for id, v_name, perk in vehicle_search_keys()],
+        'bricks': [(id, [name('bricks', id, b), str(b.id), 'x'.join(map(str, b.size))] + [str(a) for a in b.aliases])
+                   for id, b in bricks_by_id.items()],
+        'brickpacks': names('brickpacks', brickpacks_by_id),
+        'flairs': names('flairs', flairs_by_id),
+        'wheels': names('wheels', wheels_by_id),
+        'propellers': names('propellers', propellers_by_id),
+        'assemblies': names('assemblies', assemblies_by_id),
+        'stickers': names('stickers', stickers_by_id),
+    }
+    search_index = build_search_index(categories)
+    dump('search_index', search_index, add_new_to_name=False, verbose=False)
+    print('-> Dumped search_index of', len(search_index['items']), 'items')
+
+@stage('changelog', inputs=['brickpacks', 'stickers', 'assemblies', 'flairs', 'chassis', 'usage'], outputs=['changelog'])
+def changelog_stage():
+    """what changed since ./last_version/, see changelog.py"""
+    plain = lambda value: json.loads(json.dumps(value, cls=PlainJSONEncoder))
+    new_values = {
+        'brickpacks_by_id': brickpacks_by_id, 'bricks_by_id': bricks_by_id, 'stickers_by_id': stickers_by_id,
+        'assemblies_by_id': assemblies_by_id, 'wheels_by_id': wheels_by_id, 'propellers_by_id': propellers_by_id,
+        'flairs_by_id': flairs_by_id, 'chassis_by_id': chassis_by_id, 'vehicles_by_id': vehicles_by_id,
+        'vehicle_parts': vehicle_parts,
+    }
+    log = changelog.changelog({name: plain(value) for name, value in new_values.items()})
+    if not log:
+        print(' | no last_version/*_by_id.json to compare with, skipping the changelog')
+        return
+    dump('changelog', log, add_new_to_name=False, verbose=False)
+    print('-> Dumped changelog:', changelog.summary(log))
+
+
+
+def main():
+    global jobs, normalize_sources
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='stages (<- inputs -> outputs):\n' + '\n'.join(
+            f'  {s.name:<11} <- {", ".join(s.inputs) or "nothing":<28} -> {", ".join(s.outputs)}'
+            for s in stages.values()
+        )
     )
-    if brick.id in brick_usage:
-        brick.n_usage = len(brick_usage[brick.id])
-    else:
-        brick.n_usage = 0
-#dump('bricks', bricks)
-dump('bricks_by_id', bricks_by_id)
+    parser.add_argument('--only', type=lambda s: s.split(','), metavar='STAGE,...',
+                        help='only (re)build these stages. Their inputs stages are run too, but without writing anything')
+    parser.add_argument('-j', '--jobs', type=int, default=jobs,
+                        help=f'number of processes used to parse the vehicle brickgraphs and write the textures (default: {jobs})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignore and do not update the build cache, i.e. re-parse and re-write everything')
+    parser.add_argument('--normalize-sources', action='store_true',
+                        help='write each source once in sources.json, and only their index in there everywhere else')
+    parser.add_argument('--profile', metavar='OUT.json',
+                        help='write the time, calls, bytes read and written of each stage and helper, and the peak memory, to this json')
+    parser.add_argument('--cprofile', metavar='OUT.prof',
+                        help='also write the cProfile stats of the whole run to this file (pstats format, e.g. for snakeviz)')
+    parser.add_argument('--speedscope', metavar='OUT.json',
+                        help='also write the timeline of the stages and helpers of the main process to this file (for https://www.speedscope.app)')
+    parser.add_argument('--locales', type=lambda s: s.split(','), default=[], metavar='LANG,...',
+                        help='also write <name>_by_id.<lang>.json with the names in these languages (e.g. fr,de), from the same parse')
+    args = parser.parse_args()
+    if args.only is not None and (unknown := set(args.only) - set(stages)):
+        parser.error(f'unknown stage(s) {", ".join(unknown)}, expected some of: {", ".join(stages)}')
+    jobs = args.jobs
+    normalize_sources = args.normalize_sources
+    string_tables.use_locales(*args.locales)
+    build_cache.enabled = not args.no_cache
+    if args.profile or args.cprofile or args.speedscope:
+        profiling.start(cprofile=args.cprofile is not None, timeline=args.speedscope is not None)
+    build_cache.load_manifest()
+    run_stages(args.only)
+    build_cache.save()
+    if args.profile or args.cprofile or args.speedscope:
+        profiling.stop(args.profile, args.cprofile, args.speedscope)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Find catalogue ids from displayed names, e.g. the ones typed by hand from the Unkie store (see convert_unkie_names_to_ids)
+
+A NameResolver indexes a catalogue once: by normalized name (case, spacing and " (new!)" ignored), by name and
+rarity and by name and terrain, to choose between the items sharing a name, and by trigram, to match the names
+that are not found exactly (typos, missing punctuation...) to the closest ones.
+"""
+
+from collections import defaultdict, Counter
+
+
+new_suffix = ' (new!)'
+disambiguation_fields = ['rarity', 'terrain']
+
+
+def normalize(name):
+    return ' '.join(name.replace(new_suffix, '').lower().split())
+
+def trigrams(name):
+    padded = f'  {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameResolver:
+    def __init__(self, items, overrides={}, min_similarity=0.5):
+        """items: the values of a *_by_id.json, or dataclasses, with an id, a name and maybe a rarity and a terrain
+        overrides: {name: id} for the names that no field disambiguate"""
+        self.ids = defaultdict(list)       # name -> ids
+        self.ids_with = defaultdict(list)  # (name, field, value) -> ids
+        self.overrides = {normalize(name): id for name, id in overrides.items()}
+        self.min_similarity = min_similarity
+        for item in items:
+            get = item.get if isinstance(item, dict) else lambda field: getattr(item, field, None)
+            name = normalize(get('name'))
+            self.ids[name].append(get('id'))
+            for field in disambiguation_fields:
+                self.ids_with[(name, field, get(field))].append(get('id'))
+        self.names_with_trigram = defaultdict(list)
+        self.n_trigrams = {}
+        for name in self.ids:
+            name_trigrams = trigrams(name)
+            self.n_trigrams[name] = len(name_trigrams)
+            for trigram in name_trigrams:
+                self.names_with_trigram[trigram].append(name)
+
+    def closest_names(self, name):
+        """the indexed names with the most trigrams in common with name (Jaccard index), if at least min_similarity"""
+        name_trigrams = trigrams(name)
+        shared = Counter()
+        for trigram in name_trigrams:
+            shared.update(self.names_with_trigram.get(trigram, ()))
+        closest, best = [], self.min_similarity
+        for other, n in shared.items():
+            similarity = n / (len(name_trigrams) + self.n_trigrams[other] - n)
+            if similarity > best:
+                closest, best = [other], similarity
+            elif similarity == best:
+                closest.append(other)
+        return closest
+
+    def resolve(self, name, **fields):
+        """(ids, matched names) of the items named name, narrowed down by the given rarity and/or terrain if
+        several have this name. matched names is [normalize(name)], or the closest names if not found."""
+        name = normalize(name)
+        matched_names = [name] if name in self.ids else self.closest_names(name)
+        if len(matched_names) != 1:
+            return [id for other in matched_names for id in self.ids[other]], matched_names
+        name = matched_names[0]
+        ids = self.ids[name]
+        if len(ids) > 1 and name in self.overrides:
+            return [self.overrides[name]], matched_names
+        for field, value in fields.items():
+            narrowed = [id for id in ids if id in self.ids_with.get((name, field, value), ())]
+            if len(ids) > 1 and narrowed:
+                ids = narrowed
+        return ids, matched_names
@@ -0,0 +1,100 @@
+"""Columnar version of vehicle_parts.json, for brick usage queries as array operations
+
+vehicle_parts_columns/ holds one .npy per column, loaded memory-mapped (no parsing nor copy):
+- brick_id, color_id (uint32): the parts of all the vehicles, one vehicle after the other
+- vehicle_index (uint32): index in vehicle_ids of the vehicle of each part
+- offsets (int64): the parts of vehicle i are [offsets[i], offsets[i+1])
+and vehicle_ids.json, in the vehicles_by_id order.
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+table_path = Path('vehicle_parts_columns/')
+
+
+def columns(parts_and_colors_lists):
+    """the .npy columns of the given [[(brick_id, color_id), ...] for each vehicle]"""
+    lengths = np.array([len(parts) for parts in parts_and_colors_lists], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    parts = np.array([part for parts in parts_and_colors_lists for part in parts], dtype=np.uint32).reshape(-1, 2)
+    return {
+        'offsets': offsets,
+        'vehicle_index': np.repeat(np.arange(len(lengths), dtype=np.uint32), lengths),
+        'brick_id': np.ascontiguousarray(parts[:, 0]),
+        'color_id': np.ascontiguousarray(parts[:, 1]),
+    }
+
+def npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+class PartsTable:
+    def __init__(self, path=table_path):
+        path = Path(path)
+        with open(path / 'vehicle_ids.json', encoding='utf-8') as f:
+            self.vehicle_ids = json.load(f)
+        self.index_of = {id: i for i, id in enumerate(self.vehicle_ids)}
+        for column in ('offsets', 'vehicle_index', 'brick_id', 'color_id'):
+            setattr(self, column, np.load(path / f'{column}.npy', mmap_mode='r'))
+
+    def parts(self, vehicle_id):
+        """(brick_id, color_id) arrays of a vehicle"""
+        i = self.index_of[vehicle_id]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.brick_id[start:end], self.color_id[start:end]
+
+    def vehicles_using(self, brick_id):
+        """ids of the vehicles having this brick (not its aliases), in vehicle_ids order"""
+        return [self.vehicle_ids[i] for i in np.unique(self.vehicle_index[self.brick_id == brick_id])]
+
+    def color_histogram(self, vehicle_id):
+        """{color_id: number of parts of this color} of a vehicle"""
+        colors, counts = np.unique(self.parts(vehicle_id)[1], return_counts=True)
+        return dict(zip(colors.tolist(), counts.tolist()))
+
+    def usage_counts(self):
+        """{brick_id: number of vehicles using it}"""
+        pairs = np.unique(np.stack([self.brick_id, self.vehicle_index]), axis=1)
+        bricks, counts = np.unique(pairs[0], return_counts=True)
+        return dict(zip(bricks.tolist(), counts.tolist()))
+
+    def surplus_counts(self, in_brick_pack):
+        """number of distinct bricks of each vehicle that are not in in_brick_pack (see surplus_v2.vehicle_surplus)"""
+        surplus = ~np.isin(self.brick_id, np.fromiter(in_brick_pack, dtype=np.uint32))
+        pairs = np.unique(np.stack([self.vehicle_index[surplus], self.brick_id[surplus]]), axis=1)
+        return np.bincount(pairs[0], minlength=len(self.vehicle_ids))
+
+
+def check_against_dumps():
+    """compare the queries with vehicle_parts.json and brick_usage.json"""
+    table = PartsTable()
+    with open('vehicle_parts.json', encoding='utf-8') as f:
+        vehicle_parts = json.load(f)
+    with open('brick_usage.json', encoding='utf-8') as f:
+        brick_usage = json.load(f)
+    assert table.vehicle_ids == [v['id'] for v in vehicle_parts]
+    for v in vehicle_parts:
+        brick_ids, color_ids = table.parts(v['id'])
+        assert [list(p) for p in zip(brick_ids.tolist(), color_ids.tolist())] == v['parts_and_colors'], v['id']
+    usage_counts = table.usage_counts()
+    for brick_id, vehicle_ids in brick_usage.items():
+        assert usage_counts[int(brick_id)] == len(vehicle_ids), brick_id
+        assert set(table.vehicles_using(int(brick_id))) == set(vehicle_ids), brick_id
+    print('the parts table match the', len(vehicle_parts), 'vehicles and', len(brick_usage), 'used bricks')
+
+
+if __name__ == '__main__':
+    if '--check' in sys.argv:
+        check_against_dumps()
+        sys.exit()
+    table = PartsTable()
+    for brick_id in sys.argv[1:]:
+        print(brick_id, 'is used by', ', '.join(table.vehicles_using(int(brick_id))) or 'nothing')
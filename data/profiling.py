@@ -0,0 +1,223 @@
+"""Where dump_infos.py spends its time, see its --profile, --cprofile and --speedscope options
+
+Disabled (and close to free) unless enabled is set. Then, for each stage and each instrumented helper
+(load, get_name, parse_vehicle_parts, dump, the texture operations...), it records the number of
+calls, the wall time, the bytes read and written and, for the stages, the peak RSS of the process so far.
+Times and bytes are inclusive: a dump during a stage counts for both.
+
+The helpers run in worker processes (see mapped) send back what they recorded, so the report is the same
+with -j 1 or more, except for the times: the ones of the helpers are summed over the workers.
+The report is a json: {'version', 'seconds', 'peak_rss', 'peak_rss_workers', 'stages': {name: stat}, 'helpers': {name: stat}}
+The timeline is a speedscope evented profile of the same stages and helpers, for the main process only
+(the helpers run in worker processes with -j 2 or more are missing from it).
+"""
+
+import cProfile
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from functools import wraps
+from inspect import isgeneratorfunction
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+
+version = 1
+enabled = False
+
+@dataclass
+class Stat:
+    calls: int = 0
+    seconds: float = 0.0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    peak_rss: int = None  # only for the stages
+
+    def add(self, other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+
+stages = defaultdict(Stat)
+helpers = defaultdict(Stat)
+active = []  # the stats of the stage and helpers running right now, outermost first
+profiler = None
+start_time = None
+events = None  # [(kind 'O'pen or 'C'lose, name, time)] if the timeline is recorded
+
+
+def peak_rss(who='self'):
+    """peak resident memory in bytes, of this process or of its largest finished child (who='children')"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+def add_bytes(read=0, written=0):
+    """count bytes read or written by the running stage and helpers"""
+    for stat in {id(stat): stat for stat in active}.values():
+        stat.bytes_read += read
+        stat.bytes_written += written
+
+@contextmanager
+def timed(name, table=None, calls=1):
+    if not enabled:
+        yield
+        return
+    stat = (helpers if table is None else table)[name]
+    active.append(stat)
+    start = time.perf_counter()
+    if events is not None:
+        events.append(('O', name, start))
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if events is not None:
+            events.append(('C', name, end))
+        stat.seconds += end - start
+        stat.calls += calls
+        active.pop()
+
+def stage(name):
+    return timed(name, table=stages)
+
+def profiled(name):
+    """decorator recording the calls of a function as name (for a generator: the time spent in it)"""
+    def decorator(fn):
+        if isgeneratorfunction(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not enabled:
+                    return fn(*args, **kwargs)
+                return timed_generator(name, fn(*args, **kwargs))
+        else:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not enabled:
+                    return fn(*args, **kwargs)
+                with timed(name):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def timed_generator(name, generator):
+    calls = 1
+    while True:
+        with timed(name, calls=calls):
+            calls = 0
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+        yield item
+
+
+class InWorker:
+    """fn(item) as a picklable callable returning (its output, the helpers stats it recorded), see mapped"""
+    def __init__(self, name, fn, read=None):
+        self.name, self.fn, self.read = name, fn, read
+
+    def __call__(self, item):
+        global enabled, helpers, active
+        saved = enabled, helpers, active
+        enabled, helpers, active = True, defaultdict(Stat), []
+        try:
+            with timed(self.name):
+                output = self.fn(item)
+                if self.read is not None:
+                    add_bytes(read=self.read(item))
+            return output, dict(helpers)
+        finally:
+            enabled, helpers, active = saved
+
+def merge(worker_helpers, name):
+    for helper, stat in worker_helpers.items():
+        helpers[helper].add(stat)
+    if name in worker_helpers:
+        for stat in active:  # the running stage
+            stat.bytes_read += worker_helpers[name].bytes_read
+            stat.bytes_written += worker_helpers[name].bytes_written
+
+def mapped(name, map_fn=map, read=None):
+    """map_fn, with each fn(item) recorded as name (and read(item) bytes read), even in worker processes"""
+    def profiled_map(fn, items):
+        if not enabled:
+            return map_fn(fn, items)
+        outputs = []
+        for output, worker_helpers in map_fn(InWorker(name, fn, read), items):
+            merge(worker_helpers, name)
+            outputs.append(output)
+        return outputs
+    return profiled_map
+
+
+def start(cprofile=False, timeline=False):
+    global enabled, profiler, start_time, events
+    enabled = True
+    start_time = time.perf_counter()
+    events = [] if timeline else None
+    if cprofile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+def end_stage(name):
+    """to call after each stage: its peak RSS"""
+    if enabled:
+        stages[name].peak_rss = peak_rss()
+
+def report():
+    return {
+        'version': version,
+        'seconds': time.perf_counter() - start_time,
+        'peak_rss': peak_rss(),
+        'peak_rss_workers': peak_rss('children'),
+        'stages': {name: asdict(stat) for name, stat in stages.items()},
+        'helpers': {name: {k: v for k, v in asdict(stat).items() if k != 'peak_rss'}
+                    for name, stat in sorted(helpers.items(), key=lambda kv: -kv[1].seconds)},
+    }
+
+def speedscope():
+    frames = list(dict.fromkeys(name for _, name, _ in events))
+    frame_index = {name: i for i, name in enumerate(frames)}
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': 'dump_infos.py',
+        'exporter': f'profiling.py {version}',
+        'shared': {'frames': [{'name': name} for name in frames]},
+        'profiles': [{
+            'type': 'evented',
+            'name': 'main process',
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': time.perf_counter() - start_time,
+            'events': [{'type': kind, 'frame': frame_index[name], 'at': at - start_time} for kind, name, at in events],
+        }],
+    }
+
+def stop(report_path=None, cprofile_path=None, speedscope_path=None):
+    """write the json report, the cProfile stats (pstats format, e.g. for snakeviz) and the speedscope timeline"""
+    global enabled, events
+    if profiler is not None:
+        profiler.disable()
+        if cprofile_path is not None:
+            profiler.dump_stats(cprofile_path)
+            print('-> Wrote the cProfile stats to', cprofile_path)
+    if report_path is not None:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report(), f, indent=1)
+        slowest = sorted(helpers.items(), key=lambda kv: -kv[1].seconds)[:3]
+        print(f'-> Wrote the profile of {len(stages)} stages and {len(helpers)} helpers to {report_path} (slowest: '
+              + ', '.join(f'{name} {stat.seconds:.2f}s in {stat.calls} calls' for name, stat in slowest) + ')')
+    if speedscope_path is not None and events is not None:
+        with open(speedscope_path, 'w', encoding='utf-8') as f:
+            json.dump(speedscope(), f)
+        print(f'-> Wrote the timeline of {len(events) // 2} stages and helpers calls to {speedscope_path}')
+    enabled, events = False, None
@@ -0,0 +1,89 @@
+"""Precomputed search index for the website search bar (see PrecomputedIndex in ../search.js)
+
+It gives the same results as the SuffixTree the website used to fill on each visit: an item
+matches a word if one of its keys (name, id...) contains it, case insensitively, and a search
+return the items matching all its words, in the order the items were given.
+
+The index is a suffix array over the lowercased keys, joined with '\n':
+- items: [category, id] of each item
+- text: the joined keys
+- key_starts: position of each key in text
+- key_items: indices in items of the items having each key
+- suffixes: every position in text, sorted by the text that follows it up to the end of its key
+"""
+
+import json
+from bisect import bisect_left, bisect_right
+
+
+separator = '\n'  # sorts before any character we can find in a name
+
+
+def normalize(key):
+    # the website index positions in UTF-16 code units, so replace what would take two of them
+    return ''.join(c if ord(c) <= 0xFFFF else '\ufffd' for c in str(key).lower().replace(separator, ' '))
+
+def build_search_index(categories):
+    """categories: {category: [(id, [keys...]), ...]}, in display order"""
+    items, keys, key_items = [], [], []
+    key_index = {}  # identical keys (e.g. brick sizes) are stored once
+    for category, category_items in categories.items():
+        for id, item_keys in category_items:
+            for key in item_keys:
+                key = normalize(key)
+                if key not in key_index:
+                    key_index[key] = len(keys)
+                    keys.append(key)
+                    key_items.append([])
+                if key_items[key_index[key]][-1:] != [len(items)]:
+                    key_items[key_index[key]].append(len(items))
+            items.append([category, id])
+
+    key_starts = []
+    position = 0
+    for key in keys:
+        key_starts.append(position)
+        position += len(key) + len(separator)
+    text = separator.join(keys)
+
+    # only the end of each key matter, searches never span two keys
+    suffixes = sorted(
+        (text[start + i : start + len(key)], start + i)
+        for start, key in zip(key_starts, keys)
+        for i in range(len(key))
+    )
+    suffixes = [position for _, position in suffixes]
+    return {'items': items, 'text': text, 'key_starts': key_starts, 'key_items': key_items, 'suffixes': suffixes}
+
+def search_pattern(index, pattern):
+    """indices of the items that have a key containing pattern"""
+    pattern = pattern.lower()
+    if not pattern:
+        return set()
+    text, suffixes = index['text'], index['suffixes']
+    prefix = lambda position: text[position : position + len(pattern)]
+    start = bisect_left(suffixes, pattern, key=prefix)
+    end = bisect_right(suffixes, pattern, lo=start, key=prefix)
+    return {
+        item
+        for position in suffixes[start:end]
+        for item in index['key_items'][bisect_right(index['key_starts'], position) - 1]
+    }
+
+def search_all_words(index, string):
+    """[category, id] of the items matching all the space separated words of string"""
+    results = None
+    for i, word in enumerate(string.split(' ')):
+        if i == 0:
+            results = search_pattern(index, word)
+        elif word.strip():
+            results &= search_pattern(index, word)
+    return [index['items'][i] for i in sorted(results)]
+
+
+if __name__ == '__main__':
+    import sys
+    with open('search_index.json', encoding='utf-8') as f:
+        index = json.load(f)
+    for category, id in search_all_words(index, ' '.join(sys.argv[1:])):
+        print(category, id)
@@ -0,0 +1,87 @@
+"""Pack icons into a few sprite sheets, so that the website bricks list does not request each icon separately
+
+Icons are scaled to fit a icon_size square, then placed row by row (shelf packing) in the given order,
+so that the first sheets are the ones needed at the top of the page. The index gives, for each id:
+[sheet, x, y, w, h] in the sheet pixels.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import build_cache
+from texture_jobs import image_size
+
+
+icon_size = 256     # tiles display their image at ~200px
+sheet_size = 2048   # 64 icons of 256px per sheet
+sheet_format = 'webp'
+sheet_quality = 90
+
+
+def scaled_size(size):
+    width, height = size
+    scale = min(1, icon_size / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def pack(sizes):
+    """[(sheet, x, y, w, h)] of each (w, h) in sizes, placed in order on shelves as high as their tallest icon"""
+    positions = []
+    sheet, x, y, shelf_height = 0, 0, 0, 0
+    for w, h in sizes:
+        if x + w > sheet_size:  # next shelf
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if y + h > sheet_size:  # next sheet
+            sheet, x, y, shelf_height = sheet + 1, 0, 0, 0
+        positions.append((sheet, x, y, w, h))
+        x += w
+        shelf_height = max(shelf_height, h)
+    return positions
+
+def draw_sheet(path, icons):
+    """icons: [(icon path, (x, y, w, h))]"""
+    from PIL import Image
+    width = max(x + w for _, (x, y, w, h) in icons)
+    height = max(y + h for _, (x, y, w, h) in icons)
+    sheet = Image.new('RGBA', (width, height))
+    for icon_path, (x, y, w, h) in icons:
+        with Image.open(icon_path) as icon:
+            icon = icon.convert('RGBA')
+            if icon.size != (w, h):
+                icon = icon.resize((w, h), Image.LANCZOS)
+            sheet.paste(icon, (x, y))
+    Path(path).parents[0].mkdir(parents=True, exist_ok=True)
+    sheet.save(path, format=sheet_format, quality=sheet_quality)
+
+def build_atlas(icons, out_dir, url_dir, jobs=1):
+    """icons: [(id, icon path)] in display order. Write the sheets to out_dir (only the ones whose
+    icons or layout changed since the last run) and return their index, with sheets urls in url_dir"""
+    positions = pack([scaled_size(build_cache.cached('image_size', path, image_size)) for _, path in icons])
+    n_sheets = positions[-1][0] + 1 if positions else 0
+    sheets = [[] for _ in range(n_sheets)]
+    for (_, path), (sheet, *rect) in zip(icons, positions):
+        sheets[sheet].append((path, tuple(rect)))
+    sheet_paths = [Path(out_dir) / f'{n}.{sheet_format}' for n in range(n_sheets)]
+
+    key = lambda icons: (icon_size, sheet_format, sheet_quality, tuple(rect for _, rect in icons))
+    todo = [
+        (path, sheet_icons) for path, sheet_icons in zip(sheet_paths, sheets)
+        if not build_cache.is_fresh(path, [icon_path for icon_path, _ in sheet_icons], key=key(sheet_icons))
+    ]
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            list(executor.map(draw_sheet, *zip(*todo)))
+    else:
+        for path, sheet_icons in todo:
+            draw_sheet(path, sheet_icons)
+    for path, sheet_icons in zip(sheet_paths, sheets):
+        build_cache.mark_fresh(path, [icon_path for icon_path, _ in sheet_icons], key=key(sheet_icons))
+    print(f'-> Wrote {len(todo)} sprite sheets ({n_sheets - len(todo)} up to date)')
+
+    return {
+        'sheets': [f'{url_dir}/{n}.{sheet_format}' for n in range(n_sheets)],
+        'sheet_sizes': [
+            [max(x + w for _, (x, y, w, h) in sheet_icons), max(y + h for _, (x, y, w, h) in sheet_icons)]
+            for sheet_icons in sheets
+        ],
+        'icons': {id: list(position) for (id, _), position in zip(icons, positions)},
+    }
@@ -1,6 +1,7 @@
+import sys
 from PIL import Image
 import numpy as np
-from scipy.ndimage import affine_transform
+from scipy.ndimage import affine_transform, spline_filter1d
 
 def uv_map(image: np.ndarray, u1, v1, us, vs) -> np.ndarray:
     uv_image = []
@@ -25,12 +26,54 @@ def uv_map_pil(image: Image, u1, v1, us, vs) -> Image:
         )
     )
 
+def spline_coefficients(image: np.ndarray) -> np.ndarray:
+    """what affine_transform(order=3, mode='grid-wrap') prefilters each channel into,
+    for all the channels at once"""
+    coefficients = image.astype(np.float64)
+    for axis in (0, 1):
+        coefficients = spline_filter1d(coefficients, order=3, axis=axis, mode='grid-wrap')
+    return coefficients
+
+def uv_map_batch(image: np.ndarray, regions) -> list[np.ndarray]:
+    """[uv_map(image, *region) for region in regions], with the same output,
+    but the (costly) spline prefiltering of the image is only done once"""
+    xs, ys, cs = image.shape
+    assert xs == ys, "non square image detected, you might wanna check my xs/ys order is the good one before proceeding!"
+    coefficients = spline_coefficients(image)
+    uv_images = []
+    for u1, v1, us, vs in regions:
+        signe_us = -1 if us < 0 else 1
+        signe_vs = -1 if vs < 0 else 1
+        output_shape = (abs(round(vs*xs)), abs(round(us*ys)))
+        uv_image = np.empty(output_shape + (cs,), dtype=np.uint8)
+        # a single 3d order=3 pass on (x, y, channel) gives the same output, but ~3.5x slower (64 taps instead of 16)
+        for channel in range(cs):
+            affine_transform(
+                coefficients[:,:,channel], [[signe_vs, 0], [0, signe_us]], offset=[v1*xs, u1*ys],
+                output_shape=output_shape, output=uv_image[:,:,channel], mode='grid-wrap', order=3, prefilter=False
+            )
+        uv_images.append(uv_image)
+    return uv_images
+
+def uv_map_batch_pil(image: Image, regions) -> list[Image]:
+    return [Image.fromarray(uv_image) for uv_image in uv_map_batch(np.array(image), regions)]
+
+def check_batch(image: np.ndarray, regions):
+    """compare uv_map_batch with uv_map"""
+    for region, uv_image in zip(regions, uv_map_batch(image, regions)):
+        assert np.array_equal(uv_image, uv_map(image, *region)), f'uv_map_batch differ from uv_map for {region}'
+    print('uv_map_batch match uv_map for the', len(regions), 'regions')
+
 if __name__ == '__main__':
     base_path = "../Exports/LEGO2KDrive/Content/"
     image = Image.open(base_path + "LEGO/Decorations/Licensed/Ambulance_60330/Ambulance_60330.png")
-    for name, (u1, v1, us, vs) in {
+    regions = {
         "sidedecor": (0.060546, 1.473698, 0.496463, -0.285902),
         "plate2": (0.538595, 0.078112, 0.546174, 0.129805),
         "hood": (-0.017502, 1.462863, 1.043429, -0.988341),
-    }.items():
-        uv_map_pil(image, u1, v1, us, vs).save(f'_sticker_{name}.png')
+    }
+    if '--check' in sys.argv:
+        check_batch(np.array(image), list(regions.values()))
+        sys.exit()
+    for name, uv_image in zip(regions, uv_map_batch_pil(image, regions.values())):
+        uv_image.save(f'_sticker_{name}.png')
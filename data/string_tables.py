@@ -0,0 +1,187 @@
+"""Every StringTable of the game and its updates, loaded once, for dump_infos.get_name
+
+The tables (Game/StringTables and Update_N/StringTables) and their translations (Localization/*/<locale>/<Game or UpdateN>.json,
+for the locales asked with use_locales) are parsed into .build_cache/string_tables.sqlite, which is reused as long
+as none of these files changed (same names, sizes and mtimes), so most runs do not parse any of them.
+
+A name is looked up in the most recent version of the table its TableId points to having the key: later
+updates override the earlier ones, even for a TableId pointing to an older version of the table. Translations
+are looked up by the table namespace and key, and fall back to the native string.
+
+Names are returned as LocalizedName, a str remembering its TableId and Key, so that the catalogues
+can be parsed once and their names translated afterward (see dump_infos.dump_translations).
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from glob import glob
+
+
+base_path = "../Exports/LEGO2KDrive/Content/"
+db_path = Path('.build_cache/string_tables.sqlite')
+version = 1  # bump this when changing what is stored
+native_locale = 'en'
+locales = [native_locale]
+
+db = None
+tables = {}        # (locale, table_id) -> {key: string}, filled on demand from the db
+namespaces = None  # table_id -> TableNamespace
+versions = None    # table file name -> [table_id of each update having it, oldest first]
+
+
+def use_locales(*new_locales):
+    """also load these translations (e.g. 'fr', 'de'), to call before the first lookup"""
+    assert db is None, 'the string tables are already loaded'
+    for locale in new_locales:
+        if locale not in locales:
+            locales.append(locale)
+
+class LocalizedName(str):
+    """a native string, that can be translated in any of the loaded locales"""
+    def __new__(cls, string, table_id, key, prefix='', suffix=''):
+        self = super().__new__(cls, string)
+        self.table_id, self.key, self.prefix, self.suffix = table_id, key, prefix, suffix
+        return self
+
+    def __getnewargs__(self):
+        return str(self), self.table_id, self.key, self.prefix, self.suffix
+
+    def __add__(self, other):  # keep track of e.g. ' (new!)'
+        if not isinstance(other, str):
+            return NotImplemented
+        return LocalizedName(str(self) + other, self.table_id, self.key, self.prefix, self.suffix + other)
+
+    def __radd__(self, other):
+        if not isinstance(other, str):
+            return NotImplemented
+        return LocalizedName(other + str(self), self.table_id, self.key, other + self.prefix, self.suffix)
+
+    def translate(self, locale):
+        return self.prefix + lookup(self.table_id, self.key, locale) + self.suffix
+
+def update_order(relative_path):
+    """Game/... first, then Update_0/..., Update_1/..."""
+    update = Path(relative_path).parts[0]
+    return (int(update.removeprefix('Update').lstrip('_')) if update.startswith('Update') else -1), str(relative_path)
+
+def table_paths():
+    paths = glob(base_path + "Game/StringTables/*.json") + glob(base_path + "Update_*/StringTables/*.json")
+    return sorted(paths, key=lambda path: update_order(Path(path).relative_to(base_path)))
+
+def locres_order(path):
+    """Game.json first, then Update0.json, Update1.json..., each across the Localization/* folders"""
+    path = Path(path)
+    return update_order(path.stem)[0], path.parent.parent.name, path.name
+
+def locres_paths(locale):
+    """.../<locale>/<Game or UpdateN>.json (exported from the .locres)"""
+    paths = glob(base_path + f"Localization/*/{locale}/*.json")
+    return sorted(paths, key=locres_order)
+
+def table_id(path):
+    """/Game/Update_3/StringTables/X.X for ../Exports/.../Content/Update_3/StringTables/X.json"""
+    relative = Path(path).relative_to(base_path).with_suffix('').as_posix()
+    return f'/Game/{relative}.{Path(path).stem}'
+
+def fingerprint(paths):
+    hash = hashlib.blake2b(f'{version} {locales}'.encode(), digest_size=16)
+    for path in paths:
+        stat = Path(path).stat()
+        hash.update(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+    return hash.hexdigest()
+
+def load():
+    global db, namespaces, versions
+    paths = table_paths()
+    all_locres_paths = [path for locale in locales[1:] for path in locres_paths(locale)]
+    key = fingerprint(paths + all_locres_paths)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path)
+    try:
+        fresh = db.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone() == (key,)
+    except sqlite3.DatabaseError:
+        fresh = False
+    if not fresh:
+        build(paths, key)
+    namespaces = dict(db.execute("SELECT table_id, namespace FROM tables"))
+    versions = {}
+    for id in sorted(namespaces, key=lambda id: update_order(id.replace('/Game/', '', 1))):
+        versions.setdefault(id.split('.')[-1], []).append(id)
+
+def load_extra_table(table_id, path):
+    """a table outside of the usual folders, only kept in memory"""
+    with open(path, encoding='utf-8') as f:
+        string_table = json.load(f)[0]['StringTable']
+    namespaces[table_id] = string_table.get('TableNamespace')
+    versions.setdefault(table_id.split('.')[-1], []).append(table_id)
+    tables[(native_locale, table_id)] = string_table['KeysToMetaData']
+
+def build(paths, key):
+    db.executescript("""
+        DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS tables; DROP TABLE IF EXISTS strings;
+        CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE tables (table_id TEXT PRIMARY KEY, namespace TEXT);
+        CREATE TABLE strings (locale TEXT, scope TEXT, key TEXT, value TEXT, PRIMARY KEY (locale, scope, key));
+    """)
+    # native strings are scoped by table_id, translations by namespace
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            string_table = json.load(f)[0]['StringTable']
+        db.execute("INSERT INTO tables VALUES (?, ?)", (table_id(path), string_table.get('TableNamespace')))
+        db.executemany("INSERT OR REPLACE INTO strings VALUES (?, ?, ?, ?)",
+                       ((native_locale, table_id(path), k, v) for k, v in string_table['KeysToMetaData'].items()))
+    for locale in locales[1:]:
+        if not locres_paths(locale):
+            print(f' | no {locale} translations found, its names will be the {native_locale} ones')
+        for path in locres_paths(locale):  # later updates override the earlier ones
+            with open(path, encoding='utf-8') as f:
+                locres = json.load(f)
+            if isinstance(locres, list):
+                locres = locres[0]['StringTable']['KeysToMetaData']
+            db.executemany("INSERT OR REPLACE INTO strings VALUES (?, ?, ?, ?)",
+                           ((locale, namespace, k, v) for namespace, strings in locres.items() for k, v in strings.items()))
+    db.execute("INSERT INTO meta VALUES ('fingerprint', ?)", (key,))
+    db.commit()
+    print(f'-> Indexed {len(paths)} string tables' + (f' and their {", ".join(locales[1:])} translations' if locales[1:] else ''))
+
+def table(scope, locale=native_locale):
+    if (locale, scope) not in tables:
+        tables[(locale, scope)] = dict(db.execute("SELECT key, value FROM strings WHERE locale = ? AND scope = ?", (locale, scope)))
+    return tables[(locale, scope)]
+
+def lookup(table_id, key, locale=native_locale):
+    """the string key of the table table_id (e.g. /Game/Update_3/StringTables/X.X), in locale"""
+    if db is None:
+        load()
+    string_table_file = table_id.replace('/Game/', '', 1).split('.')[0] + '.json'
+    assert table_id.count('.') <= 1, f'need better extension remover code for {table_id}'
+    if table_id not in namespaces:
+        try:
+            load_extra_table(table_id, base_path + string_table_file)
+        except FileNotFoundError as e:
+            e.args = (*e.args, 'maybe you forgot to dump the game files from the new update(s)?', string_table_file)
+            raise(e)
+    # later updates override the earlier ones: use the latest version of the table having this key
+    for other_id in reversed(versions[table_id.split('.')[-1]]):
+        if key in table(other_id):
+            table_id = other_id
+            break
+    else:
+        raise KeyError(key, 'maybe you forgot to re-dump the game files from the new update(s)?', string_table_file)
+    if locale != native_locale:
+        translation = table(namespaces[table_id], locale).get(key)
+        if translation is not None:
+            return translation
+    return table(table_id)[key]
+
+def localized(table_id, key):
+    """the native string of lookup(table_id, key), as a LocalizedName"""
+    return LocalizedName(lookup(table_id, key), table_id, key)
+
+
+if __name__ == '__main__':
+    load()
+    for (id, namespace) in namespaces.items():
+        print(id, namespace, len(table(id)))
@@ -1,37 +1,30 @@
 """v2: determine surplus parts from Bricks data, much better (it was theeeeere dammit)"""
 
-import json
 import pathlib
-from glob import glob
 from shutil import copy
 
+import alias_resolver
+import brick_catalogue
+
 
-parts_in_packs = [] # including the starting parts, present in DefaultBrickPack.uasset
-brick_names = {}
 base_path = "../Exports/LEGO2KDrive/Content/LEGO/"
-    
-def populate_from_parts():
-    for part_path in glob(base_path + "Bricks/*.json"):
-        name = pathlib.Path(part_path).stem
-        if name.startswith('LPG_') or name.startswith('T_') or name.startswith('SM_'):
-            continue
-        with open(part_path) as f:
-            try:
-                json_dict = [d for d in json.load(f) if d["Type"] == "LegoPart"]
-                brick_names[int(name)] = json_dict[0]["Properties"]["PartName"].get("CultureInvariantString", name)
-                if json_dict[0]["Properties"].get("bIsInBrickPack", False):
-                    parts_in_packs.append(int(name))
-            except (IndexError, KeyError, ValueError) as e:
-                print(" | could not determine if part", name, "is in a brickpack:", e)
-populate_from_parts()
-#print(parts_in_packs, sep='\n')
-print(len(parts_in_packs), "parts in packs.")
 
 def vehicle_surplus(parts_in_vehicle):
-    return set(parts_in_vehicle) - set(parts_in_packs)
+    # parts in packs include the starting parts, present in DefaultBrickPack.uasset
+    resolver = alias_resolver.get()
+    np = alias_resolver.np
+    if np is None:
+        return {part for part in set(parts_in_vehicle) if not resolver.is_in_brick_pack(part)}
+    parts = np.unique(np.asarray(parts_in_vehicle, dtype=np.int64))
+    known = (parts >= 0) & (parts < resolver.size)  # the others are in no brick pack
+    in_brick_pack = np.zeros(len(parts), dtype=bool)
+    in_brick_pack[known] = alias_resolver.as_numpy(resolver.in_brick_pack)[parts[known]] == 1
+    return set(parts[~in_brick_pack].tolist())
 
 if __name__ == '__main__':
 
+    brick_names = brick_catalogue.get().names
+    print(len(brick_catalogue.get().in_brick_pack), "parts in packs.")
     parts_in_vehicle = [int(s) for (i, s) in enumerate(open("surplus_vehicle.txt").readlines()) if i%2==0]
 
     pathlib.Path("surplus/").mkdir(parents=True, exist_ok=True)
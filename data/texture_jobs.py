@@ -0,0 +1,173 @@
+"""Deferred texture writes for dump_infos.py: queued while parsing, then run by its textures stage
+
+Each job derives one image from a source file (plain copy, crop to content, or sticker uv mapping)
+and writes it to one or more destinations. A destination is skipped if the build cache says it was
+written from a source with the same content hash and the same operation, and was not touched since.
+Jobs with the same source content and operation are only computed once, then copied around.
+
+The tile images (see variant_dirs) then get webp variants for the website <img srcset>, e.g.
+../textures/bricks/_128/3001.webp, _256/3001.webp (only if smaller than the image) and _full/3001.webp.
+Their manifest give the image widths: {'format': 'webp', 'widths': [128, 256], 'images': {'bricks/3001': 512}}
+"""
+
+from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from shutil import copy as _copy
+
+import build_cache
+import profiling
+
+
+textures_path = Path('../textures/')
+variant_dirs = ['bricks', 'brickpacks', 'stickers', 'flairs', 'wheels', 'propellers', 'assemblies']
+variant_widths = [128, 256]  # tiles display their image at ~200px, so 256 is enough at 1x
+variant_format = 'webp'
+variant_quality = 90
+
+
+@dataclass
+class TextureJob:
+    op: str      # 'copy', 'crop', 'uv' or 'resize'
+    src: str
+    dsts: list[str]
+    args: tuple  # the op parameters, e.g. (u1, v1, us, vs) for 'uv'
+
+    def cache_key(self):
+        return (self.op, *self.args)
+
+queued = []
+
+def add(op, src, dsts, args=()):
+    assert op in ops, f'unknown texture operation {op}, expected one of {", ".join(ops)}'
+    queued.append(TextureJob(op, str(src), [str(dst) for dst in dsts], tuple(args)))
+
+def clear():
+    queued.clear()
+
+
+def copy(job):
+    _copy(job.src, job.dsts[0])
+
+def crop(job):
+    from PIL import Image
+    image = Image.open(job.src)
+    image.crop(image.getbbox()).save(job.dsts[0])
+
+def uv(job):
+    uv_sheet([job])
+
+def uv_sheet(jobs):
+    """uv jobs sharing the same source sheet, which is only decoded and prefiltered once"""
+    from PIL import Image
+    from sticker_uv_mapping import uv_map_batch_pil
+    for job, uv_image in zip(jobs, uv_map_batch_pil(Image.open(jobs[0].src), [job.args for job in jobs])):
+        uv_image.save(job.dsts[0])
+
+def resize(job):
+    from PIL import Image
+    width, format = job.args
+    image = Image.open(job.src)
+    if width != 'full' and width < image.width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    image.save(job.dsts[0], format=format, quality=variant_quality)
+
+ops = {'copy': copy, 'crop': crop, 'uv': uv, 'resize': resize}
+profiled_names = {'copy': 'texture copy', 'crop': 'texture crop', 'uv': 'uv_map_batch_pil', 'resize': 'texture resize'}
+
+def run_jobs(jobs):
+    """write each job.dsts[0] with the job operation, then copy it to the other destinations"""
+    for job in jobs:
+        for dst in job.dsts:
+            Path(dst).parents[0].mkdir(parents=True, exist_ok=True)
+    if jobs[0].op == 'uv':
+        with profiling.timed(profiled_names['uv'], calls=len(jobs)):
+            uv_sheet(jobs)
+            if profiling.enabled:
+                profiling.add_bytes(read=Path(jobs[0].src).stat().st_size,
+                                    written=sum(Path(job.dsts[0]).stat().st_size for job in jobs))
+    else:
+        for job in jobs:
+            with profiling.timed(profiled_names[job.op]):
+                ops[job.op](job)
+                if profiling.enabled:
+                    profiling.add_bytes(read=Path(job.src).stat().st_size, written=Path(job.dsts[0]).stat().st_size)
+    for job in jobs:
+        for dst in job.dsts[1:]:
+            _copy(job.dsts[0], dst)
+
+
+def image_size(path):
+    from PIL import Image
+    with Image.open(path) as image:
+        return image.size
+
+def variant_path(path, width):
+    """width: one of variant_widths, or 'full'"""
+    path = Path(path)
+    return path.parent / f'_{width}' / (path.stem + '.' + variant_format)
+
+def run(jobs=1):
+    """run the queued jobs that are not up to date, in jobs processes,
+    then the same for the variants of what they wrote. Return the variants manifest"""
+    n_written, n_fresh = execute(queued, jobs)
+    print(f'-> Wrote {n_written} textures ({n_fresh} up to date)')
+
+    manifest = {'format': variant_format, 'widths': variant_widths, 'images': {}}
+    try:
+        from PIL import features
+        have_encoder = features.check(variant_format)
+    except ImportError:
+        have_encoder = False
+    if not have_encoder:
+        print(f'/!\ WARNING /!\: pillow not found or without {variant_format} support. skipping the texture variants...')
+        clear()
+        return manifest
+    variants = []
+    for job in queued:
+        for dst in job.dsts:
+            relative = Path(dst).relative_to(textures_path)
+            if relative.parts[0] not in variant_dirs or any(part.startswith('_') for part in relative.parts):
+                continue  # not a tile image, or already a variant/alternative name
+            width, _ = build_cache.cached('image_size', dst, image_size)
+            manifest['images'][relative.with_suffix('').as_posix()] = width
+            for w in [w for w in variant_widths if w < width] + ['full']:
+                variants.append(TextureJob('resize', dst, [str(variant_path(dst, w))], (w, variant_format)))
+    n_written, n_fresh = execute(variants, jobs)
+    print(f'-> Wrote {n_written} texture variants ({n_fresh} up to date)')
+    clear()
+    return manifest
+
+def execute(jobs_, jobs=1):
+    """run the given jobs destinations that are not up to date, return (n written, n up to date)"""
+    todo = {}  # (source content hash, op, args) -> job writing all the stale destinations
+    n_fresh = 0
+    for job in jobs_:
+        stale = [dst for dst in job.dsts if not build_cache.is_fresh(dst, [job.src], key=job.cache_key())]
+        n_fresh += len(job.dsts) - len(stale)
+        if stale:
+            content_key = (build_cache.content_hash(job.src), job.cache_key())
+            if content_key in todo:
+                todo[content_key].dsts += [dst for dst in stale if dst not in todo[content_key].dsts]
+            else:
+                todo[content_key] = TextureJob(job.op, job.src, stale, job.args)
+    todo = list(todo.values())
+    # the uv mappings of a same sticker sheet are done together, the other jobs one by one
+    units = defaultdict(list)
+    for job in todo:
+        units[job.src if job.op == 'uv' else id(job)].append(job)
+    units = list(units.values())
+    if jobs > 1 and len(units) > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            # small chunks when there are few units, so that a few heavy sheets do not end up in the same one
+            map_fn = partial(executor.map, chunksize=8 if len(units) > 64 * jobs else 1)
+            list(profiling.mapped('texture_jobs', map_fn)(run_jobs, units))
+    else:
+        list(profiling.mapped('texture_jobs')(run_jobs, units))
+
+    for job in jobs_:
+        for dst in job.dsts:
+            build_cache.mark_fresh(dst, [job.src], key=job.cache_key())
+    return sum(len(job.dsts) for job in todo), n_fresh
@@ -0,0 +1,53 @@
+"""Read the components of a given "Type" from a FModel json export, without building the other ones
+
+Exports are a list of components, and many files (e.g. LEGO/Decorations/Licensed, Data/RewardsTables)
+hold large components we throw away right after parsing them. Without orjson (which is fast enough
+to parse everything), components are decoded one at a time, and the ones of another type are skipped
+without being decoded: FModel writes them indented, and since raw newlines cannot appear in json
+strings, the first line starting with their indentation followed by a '}' is their end.
+"""
+
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+type_pattern = re.compile(r'\{\s*"Type"\s*:\s*"([^"\\]*)"')  # "Type" is the first key of every component
+whitespace = re.compile(r'\s*')
+decoder = json.JSONDecoder()
+
+
+def load_components(path, type):
+    """[component for component in json.load(path) if component["Type"] == type]"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return [component for component in orjson.loads(f.read()) if component["Type"] == type]
+    with open(path, encoding='utf-8') as f:
+        return parse_components(f.read(), type)
+
+def parse_components(text, type):
+    pos = whitespace.match(text).end()
+    assert text[pos] == '[', f'expected a list of components, found {text[pos:pos + 20]!r}'
+    components = []
+    pos = whitespace.match(text, pos + 1).end()
+    while text[pos] != ']':
+        match = type_pattern.match(text, pos)
+        line_start = text.rfind('\n', 0, pos) + 1
+        indent = text[line_start:pos]
+        end = -1
+        if match is not None and match.group(1) != type and line_start > 0 and not indent.strip():
+            end = text.find('\n' + indent + '}', pos)
+        if end != -1:  # skip it
+            pos = end + len(indent) + 2
+        else:  # wanted, or written on one line: decode it
+            component, pos = decoder.raw_decode(text, pos)
+            if component["Type"] == type:
+                components.append(component)
+        pos = whitespace.match(text, pos).end()
+        if text[pos] == ',':
+            pos = whitespace.match(text, pos + 1).end()
+    return components
@@ -0,0 +1,74 @@
+"""Brick -> vehicles index in compressed sparse row layout, read by the brick page (see fetch_brick_usage in ../load.js)
+
+- brick_usage_index.json: {'vehicle_ids': [...], 'brick_ids': [sorted], 'offsets': [len(brick_ids) + 1 ints]}
+- brick_usage_index.bin: uint32 little endian indices in vehicle_ids, the vehicles using brick_ids[i]
+  being the ones in [offsets[i], offsets[i+1]), in the same order as in brick_usage.json
+"""
+
+import json
+import sys
+from array import array
+from bisect import bisect_left
+
+
+index_name = 'brick_usage_index'
+item_size = 4
+
+
+def build(brick_usage, vehicle_ids):
+    """(json header, bin content) of brick_usage ({brick_id: [vehicle_id, ...]})"""
+    index_of = {id: i for i, id in enumerate(vehicle_ids)}
+    brick_ids = sorted(brick_usage)
+    offsets = [0]
+    indices = array('I')
+    assert indices.itemsize == item_size
+    for brick_id in brick_ids:
+        indices.extend(index_of[id] for id in brick_usage[brick_id])
+        offsets.append(len(indices))
+    if sys.byteorder == 'big':
+        indices.byteswap()
+    return {'vehicle_ids': list(vehicle_ids), 'brick_ids': brick_ids, 'offsets': offsets}, indices.tobytes()
+
+
+class UsageIndex:
+    def __init__(self, path=index_name):
+        with open(f'{path}.json', encoding='utf-8') as f:
+            header = json.load(f)
+        self.vehicle_ids = header['vehicle_ids']
+        self.brick_ids = header['brick_ids']
+        self.offsets = header['offsets']
+        self.bin_path = f'{path}.bin'
+
+    def vehicles_using(self, brick_id):
+        """ids of the vehicles using brick_id (not its aliases), only reading its slice of the .bin"""
+        i = bisect_left(self.brick_ids, brick_id)
+        if i == len(self.brick_ids) or self.brick_ids[i] != brick_id:
+            return []
+        start, end = self.offsets[i], self.offsets[i + 1]
+        indices = array('I')
+        with open(self.bin_path, 'rb') as f:
+            f.seek(start * item_size)
+            indices.frombytes(f.read((end - start) * item_size))
+        if sys.byteorder == 'big':
+            indices.byteswap()
+        return [self.vehicle_ids[i] for i in indices]
+
+
+def check_against_dumps():
+    """compare the index with brick_usage.json"""
+    index = UsageIndex()
+    with open('brick_usage.json', encoding='utf-8') as f:
+        brick_usage = json.load(f)
+    for brick_id, vehicle_ids in brick_usage.items():
+        assert index.vehicles_using(int(brick_id)) == vehicle_ids, brick_id
+    assert len(index.brick_ids) == len(brick_usage)
+    print('the usage index match the', len(brick_usage), 'bricks of brick_usage.json')
+
+
+if __name__ == '__main__':
+    if '--check' in sys.argv:
+        check_against_dumps()
+        sys.exit()
+    index = UsageIndex()
+    for brick_id in sys.argv[1:]:
+        print(brick_id, 'is used by', ', '.join(index.vehicles_using(int(brick_id))) or 'nothing')
@@ -1,27 +1,22 @@
 """Extract parts numbers and colors from a vehicle brickgraph exported to raw .uexp"""
 
 import json
+import sys
 from pathlib import Path
 from glob import glob
 
+import brick_catalogue
 
-base_path = "../Exports/LEGO2KDrive/Content/Game/Vehicle/Configs/BrickGraphs/"
-max_bricks = 10000  # ignore arrays larger than this
+try:
+    import numpy as np
+    import alias_resolver
+    part_dtype = np.dtype([('brick_id', '<u4'), ('color_id', '<u4')])
+except ImportError:
+    np = None  # fall back to the (much slower) byte per byte scanner
 
-brick_ids = set()
-brick_aliases = {}
-for path in glob("../Exports/LEGO2KDrive/Content/LEGO/Bricks/*.json"):
-    filename = Path(path).stem
-    if filename.isnumeric():
-        brick_ids.add(int(filename))
 
-        with open(path) as f:
-            json_dict = [d for d in json.load(f) if d["Type"] == "LegoPart"]
-            properties = json_dict[0]["Properties"]
-            if 'Aliases' in properties and properties["Aliases"] is not None:
-                for alias in properties["Aliases"]:
-                    brick_aliases[alias] = int(filename)
-brick_ids_or_aliases = brick_ids.union(brick_aliases.keys())
+base_path = "../Exports/LEGO2KDrive/Content/Game/Vehicle/Configs/BrickGraphs/"
+max_bricks = 10000  # ignore arrays larger than this
 
 
 def read_int(file_bytes, start, end_excl, signed=False):
@@ -34,9 +29,79 @@ def parse_vehicle_parts(brickgraph_path, verbose=1):
 
     assert brickgraph_path.endswith('.uexp'), 'carefull not to use the .uasset ;)'
 
+    if np is not None:
+        candidates = scan_candidates(file_bytes, verbose)
+    else:
+        candidates = scan_candidates_bytewise(file_bytes, verbose)
+    assert len(candidates) > 0, 'Did not found any brick_and_colors arrays candidates'
+    if len(candidates) > 1:
+        print(f'Found {len(candidates)} brick_and_colors arrays candidates, returning the biggest')
+        candidates.sort(key=lambda c: len(c), reverse=True)
+    return candidates[0]
+
+min_nulls = 21  # number of 0x00 that precede the parts list
+length_offset = 53  # the array length is stored that many bytes before the first brick_id
+canonical_ids = None  # numpy view of the alias_resolver canonical table (-1 for unknown ids), built on first use
+
+def scan_candidates(file_bytes, verbose=1):
+    """same candidates as scan_candidates_bytewise, but with array operations:
+    null runs are found in one go, and each potential array is checked at once
+    as a structured (brick_id, color_id) view instead of 8 bytes at a time"""
+    global canonical_ids
+    brick_ids_or_aliases = brick_catalogue.get().ids_or_aliases
+    if canonical_ids is None:
+        canonical_ids = alias_resolver.as_numpy(alias_resolver.get().canonical)
+
+    data = np.frombuffer(file_bytes, dtype=np.uint8)
+    # +1 where a null run starts, -1 on the first non-null byte after it
+    edges = np.diff((data == 0).astype(np.int8), prepend=0, append=0)
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_runs = (run_ends - run_starts >= min_nulls) & (run_ends < len(data))
+    runs = list(zip(run_starts[long_runs].tolist(), run_ends[long_runs].tolist()))
+
+    candidates = []
+    for neg_offset in range(4):  # see (*) in scan_candidates_bytewise
+        scan_from = 0  # null counting restarts after each array we tried to parse
+        for run_start, first_byte in runs:
+            if first_byte - max(run_start, scan_from) < min_nulls:
+                continue
+            offset = first_byte - neg_offset
+            if offset < length_offset:
+                continue
+            array_length = read_int(file_bytes, start=offset-length_offset, end_excl=offset-length_offset+4)
+            if not (1 <= array_length <= max_bricks
+                    and read_int(file_bytes, start=offset, end_excl=offset+4) in brick_ids_or_aliases):
+                continue
+            if verbose >= 1:
+                print("found potential array of size", array_length, "(in pieces) at", hex(offset))
+            n_parsable = min(array_length, (len(file_bytes) - offset) // 8)
+            parts = np.frombuffer(file_bytes, dtype=part_dtype, count=n_parsable, offset=offset)
+            brick_ids = parts['brick_id']
+            known = brick_ids < len(canonical_ids)
+            known[known] = canonical_ids[brick_ids[known]] != -1
+            invalid = np.flatnonzero(~known)
+            n_valid = invalid[0] if len(invalid) else n_parsable
+            if verbose >= 2:
+                for brick_id in parts['brick_id'][:n_valid].tolist():
+                    print(' |', brick_id)
+            if len(invalid):
+                if verbose >= 1:
+                    print(' |', parts['brick_id'][n_valid], 'is not a lego brick! aborting')
+                scan_from = offset + 8 * n_valid + 8
+            elif n_parsable < array_length:
+                break  # the array runs past the end of the file, nothing left to scan
+            else:
+                candidates.append(list(zip(parts['brick_id'].tolist(), parts['color_id'].tolist())))
+                scan_from = offset + 8 * array_length
+    return candidates
+
+def scan_candidates_bytewise(file_bytes, verbose=1):
+    """reference implementation, used when numpy is not available"""
 
     SEEKING_NULLS = 0
     PARSING_ARRAY = 1
+    brick_ids_or_aliases = brick_catalogue.get().ids_or_aliases
     
     candidates = []
 
@@ -84,13 +149,27 @@ def parse_vehicle_parts(brickgraph_path, verbose=1):
                     array_start = None
                     array_length = None
                     bricks_and_colors = []
-    assert len(candidates) > 0, 'Did not found any brick_and_colors arrays candidates'
-    if len(candidates) > 1:
-        print(f'Found {len(candidates)} brick_and_colors arrays candidates, returning the biggest')
-        candidates.sort(key=lambda c: len(c), reverse=True)
-    return candidates[0]
+    return candidates
+
+def check_against_dumps(dump_path="vehicle_parts/"):
+    """compare both scanners with the parts_and_colors previously dumped by dump_infos.py"""
+    n_checked = 0
+    for json_path in sorted(glob(dump_path + "*.json")):
+        id = Path(json_path).stem
+        with open(json_path, encoding='utf-8') as f:
+            expected = [tuple(p) for p in json.load(f)["parts_and_colors"]]
+        with open(base_path + id + '.uexp', 'rb') as f:
+            file_bytes = f.read()
+        for scan in (scan_candidates, scan_candidates_bytewise):
+            candidates = sorted(scan(file_bytes, verbose=0), key=lambda c: len(c), reverse=True)
+            assert candidates and candidates[0] == expected, f'{scan.__name__} disagree with {json_path}'
+        n_checked += 1
+    print("both scanners match the", n_checked, "dumped vehicles")
 
 if __name__ == '__main__':
+    if '--check' in sys.argv:
+        check_against_dumps()
+        sys.exit()
     brickgraph_path = base_path + "GreenMachine_VC000.uexp"  # "FF_Brian_NissanSkylineGTR.uexp"
     bricks_and_colors = parse_vehicle_parts(brickgraph_path)
     json_path = f"{Path(brickgraph_path).stem}_{len(bricks_and_colors)}_bricks.jsonl"
@@ -1,10 +1,12 @@
-import { SuffixTree, all_words_in_name } from './search.js';
-import { load_async, load_vehicle, load_brick, load_simple, yieldingLoop } from './load.js';
+import { SuffixTree, PrecomputedIndex, all_words_in_name } from './search.js';
+import { load_async, load_vehicle, load_brick, load_simple, yieldingLoop, fetch_bricks } from './load.js';
 import { tiles } from './tiles.js';
 
 console.log('starting...');
 
-let search_index = new SuffixTree();
+let search_index = null;  // built by data/search_index.py, or filled tile by tile if there is none
+let unindexed = [];  // [keys, [category, id]] of the tiles loaded before we know which, then null
+let tiles_by_item = {};  // 'category/id' -> loaded tile
 let serch_input = document.querySelector(".search-text");
 let serch_results = document.querySelector("#search-results");
 let serch_category = document.querySelector("#search-category");
@@ -16,7 +18,10 @@ serch_input.addEventListener('input', function (evt) {
   let results;
   if (text != '') {
     let start = performance.now();
-    results = search_index.search_all_words(text);
+    // tiles not loaded yet will be added by add_to_ongoing_search
+    results = (search_index ? search_index.search_all_words(text) : [])
+      .map(([category, id]) => tiles_by_item[category + '/' + id])
+      .filter(tile => tile !== undefined);
     let end = performance.now(); console.log(`seach ${local_count}: ${end - start} ms`);
   }
   // tried those 3 options, roughly equivallent in perf:
@@ -49,28 +54,36 @@ function show() {
   
 }
 
+fetch("data/search_index.json").then(response => response.json())
+  .then(index => {
+    search_index = new PrecomputedIndex(index);
+  })
+  .catch(() => {  // data dumped without it: index the tiles ourselves, as they are loaded
+    search_index = new SuffixTree();
+    for (let [keys, item] of unindexed)
+      for (let key of keys)
+        search_index.add(key, item);
+  })
+  .then(() => {
+    unindexed = null;
+    if (serch_input.value != '')  // typed before the index arrived
+      serch_input.dispatchEvent(new Event('input'));
+  });
+
 // fetch all data from the begining, and start loading vehicle right away...
-Promise.all([
-  fetch("data/vehicles_by_id.json").then(response => response.json())
-    .then(vehicles => load_async(v(vehicles), load_and_index_vehicle, "vehicles")),
-  fetch("data/bricks_by_id.json").then(response => response.json()),
-  fetch("data/brickpacks_by_id.json").then(response => response.json()),
-  fetch("data/flairs_by_id.json").then(response => response.json()),
-  fetch("data/wheels_by_id.json").then(response => response.json()),
-  fetch("data/propellers_by_id.json").then(response => response.json()),
-  fetch("data/assemblies_by_id.json").then(response => response.json()),
-  fetch("data/stickers_by_id.json").then(response => response.json())
-])
-// ...but only start loading the other things sequentially after that,
-// to preserve search results order, and load vehicles quicker.
-.then(async ([_, bricks, brickpacks, flairs, wheels, propellers, assemblies, stickers]) => {
-  await load_async(v(bricks), load_and_index_brick, "bricks");
-  await load_async(v(brickpacks), load_and_index_simple, "brickpacks", "items_template");
-  await load_async(v(flairs), load_and_index_simple, "flairs", "items_template");
-  await load_async(v(wheels), load_and_index_simple, "wheels", "items_template");
-  await load_async(v(propellers), load_and_index_simple, "propellers", "items_template");
-  await load_async(v(assemblies), load_and_index_simple, "assemblies", "items_template");
-  await load_async(v(stickers), load_and_index_simple, "stickers", "items_template");
+let fetch_json = (path) => fetch(path).then(response => response.json());
+let vehicles_loaded = fetch_json("data/vehicles_by_id.json")
+  .then(vehicles => load_async(v(vehicles), load_and_index_vehicle, "vehicles"));
+let bricks = fetch_bricks();
+let others = ["brickpacks", "flairs", "wheels", "propellers", "assemblies", "stickers"]
+  .map(category => [category, fetch_json(`data/${category}_by_id.json`)]);
+// ...but only start loading the other things sequentially after that, to preserve search results order,
+// and load vehicles quicker. The bricks are drawn as soon as their summary is there, without waiting for the rest
+vehicles_loaded.then(async () => {
+  await load_async(v(await bricks), load_and_index_brick, "bricks");
+  for (let [category, items] of others) {
+    await load_async(v(await items), load_and_index_simple, category, "items_template");
+  }
   // stop displaying loading indicators
   for (let e of document.getElementsByClassName('loading')) {
     e.style.visibility = 'hidden';
@@ -82,45 +95,48 @@ Promise.all([
 
 function load_and_index_vehicle(data, tiles) {
   let tile = load_vehicle(data, tiles);
-  search_index.add(data.name, tile);
-  add_to_ongoing_search(data.name, tile);
-  //search_index.add(data.id, tile);
-  //add_to_ongoing_search(data.id, tile);
-  if (data.perk != null) {
-    search_index.add(data.perk, tile);
-    add_to_ongoing_search(data.perk, tile);
-  }
+  tiles_by_item[tiles[1].id + '/' + data.id] = tile;
+  let keys = [data.name];
+  //keys.push(data.id);
+  if (data.perk != null)
+    keys.push(data.perk);
+  index_tile(keys, [tiles[1].id, data.id]);
+  add_to_ongoing_search(keys, tile);
 }
 
 function load_and_index_brick(data, tiles) {
   let tile = load_brick(data, tiles);
-  search_index.add(data.name, tile);
-  search_index.add(data.id.toString(), tile);
-  search_index.add(data.size.join('x'), tile);
-  add_to_ongoing_search(data.name, tile);
-  add_to_ongoing_search(data.id.toString(), tile);
-  add_to_ongoing_search(data.size.join('x'), tile);
-  for (let alias of data.aliases) {
-    search_index.add(alias.toString(), tile);
-    add_to_ongoing_search(alias.toString(), tile);
-  }
+  tiles_by_item[tiles[1].id + '/' + data.id] = tile;
+  let keys = [data.name, data.id.toString(), data.size.join('x'), ...data.aliases.map(alias => alias.toString())];
+  index_tile(keys, [tiles[1].id, data.id]);
+  add_to_ongoing_search(keys, tile);
 }
 
 function load_and_index_simple(data, tiles) {
   let tile = load_simple(data, tiles)
-  search_index.add(data.name, tile);
-  add_to_ongoing_search(data.name, tile);
+  tiles_by_item[tiles[1].id + '/' + data.id] = tile;
+  index_tile([data.name], [tiles[1].id, data.id]);
+  add_to_ongoing_search([data.name], tile);
+}
+
+function index_tile(keys, item) {
+  /* only needed without search_index.json */
+  if (search_index instanceof SuffixTree) {
+    for (let key of keys)
+      search_index.add(key, item);
+  } else if (unindexed !== null) {
+    unindexed.push([keys, item]);
+  }
 }
 
-function add_to_ongoing_search(key, result) {
+function add_to_ongoing_search(keys, result) {
+  // same matching as search_index: each word has to be in one of the keys
   let ongoing_search = serch_input.value;
   if (ongoing_search != '')
   {
-    if (all_words_in_name(ongoing_search, key))
-    {
+    let words = ongoing_search.split(' ');
+    if (words.every(word => keys.some(key => all_words_in_name(word, key))))
       serch_results.append(result.cloneNode(true));
-      return;
-    }
   }
 }
 
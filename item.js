@@ -1,4 +1,4 @@
-import { load_vehicle, load_brick, load_source, load_async, load_simple, snakecase, removeSuffix } from './load.js';
+import { load_vehicle, load_brick, load_source, resolve_sources, load_async, load_simple, snakecase, removeSuffix, fetch_bricks } from './load.js';
 import { tiles } from './tiles.js';
 
 {
@@ -9,12 +9,12 @@ import { tiles } from './tiles.js';
     fetch('data/'+itemType+'s_by_id.json').then(response => response.json()),
     //fetch('data/sources_for_any_id.json').then(response => response.json()),
     //fetch(`data/brick_usage/${id}.json`).then(response => response.json()),
-    fetch('data/bricks_by_id.json').then(response => response.json()),
+    fetch_bricks(),
     //fetch('data/vehicles_by_id.json').then(response => response.json())
   ]
   ).then(([items, all_bricks /*, all_brickpacks, all_vehicles*/]) => {
     load_item(items[id], itemType);
-    load_async(items[id].sources, load_source, "sources");
+    resolve_sources(items[id].sources).then(sources => load_async(sources, load_source, "sources"));
     if (itemType == 'brickpack')
     {
       load_async(items[id].bricks.map(id => all_bricks[id]), load_brick, "pieces", "bricks_template");
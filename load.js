@@ -1,6 +1,61 @@
 import { tiles } from './tiles.js';
 
-export { load_async, load_vehicle, load_brick, load_source, load_simple, yieldingLoop, snakecase, removeSuffix };
+export { load_async, load_vehicle, load_brick, load_source, resolve_sources, load_simple, yieldingLoop, snakecase, removeSuffix,
+         fetch_bricks, fetch_brick_details, fetch_brick_usage };
+
+// widths of the textures having smaller webp variants, see data/texture_jobs.py
+let texture_variants = null;  // fetched on the first set_image, without blocking the pages scripts
+let texture_variants_loaded = null;
+
+function set_image(image, path) {
+  /* set a tile <img> to textures/path (.png), and let the browser pick one of its variants if any */
+  if (texture_variants === null) {
+    texture_variants_loaded ??= fetch('data/texture_variants.json')
+      .then(response => response.ok ? response.json() : {images: {}})
+      .catch(() => ({images: {}}))
+      .then(variants => texture_variants = variants);
+    texture_variants_loaded.then(() => set_image(image, path));
+    return;
+  }
+  image.src = path;
+  let name = path.replace(/^textures\//, '').replace(/\.png$/, '');
+  let width = texture_variants.images[name];
+  if (width === undefined)
+    return;
+  let slash = name.lastIndexOf('/');
+  let [dir, file] = [name.substring(0, slash), name.substring(slash + 1)];
+  let variant = (w) => encodeURI(`textures/${dir}/_${w}/${file}.${texture_variants.format}`);  // srcset urls end at the first space
+  image.srcset = texture_variants.widths.filter(w => w < width).map(w => `${variant(w)} ${w}w`)
+    .concat([`${variant('full')} ${width}w`]).join(', ');
+  image.sizes = `${Math.min(width, Math.max(...texture_variants.widths))}px`;
+}
+
+// brick icons sprite sheets, see data/sprite_atlas.py
+let brick_atlas = undefined;  // fetched on the first load_brick, null if there is none
+let brick_atlas_loaded = null;
+
+function fetch_brick_atlas() {
+  brick_atlas_loaded ??= fetch('data/brick_atlas.json')
+    .then(response => response.ok ? response.json() : null)
+    .catch(() => null)
+    .then(atlas => brick_atlas = atlas);
+  return brick_atlas_loaded;
+}
+
+function set_sprite(image, [sheet, x, y, w, h]) {
+  /* replace a tile <img> by a div showing the [x, y, w, h] part of the brick_atlas sheet */
+  let [sheet_w, sheet_h] = brick_atlas.sheet_sizes[sheet];
+  let sprite = document.createElement('div');
+  sprite.id = image.id;
+  sprite.className = image.className + ' sprite';
+  sprite.style.aspectRatio = `${w} / ${h}`;
+  sprite.style.backgroundImage = `url("${brick_atlas.sheets[sheet]}")`;
+  sprite.style.backgroundSize = `${sheet_w / w * 100}% ${sheet_h / h * 100}%`;
+  // in percents, so that it still works when the sprite is scaled
+  let percent = (offset, sprite_size, sheet_size) => sheet_size > sprite_size ? offset / (sheet_size - sprite_size) * 100 : 0;
+  sprite.style.backgroundPosition = `${percent(x, w, sheet_w)}% ${percent(y, h, sheet_h)}%`;
+  image.replaceWith(sprite);
+}
 
 const rarities = {
   undefined: 'rarity0',
@@ -67,8 +122,20 @@ function load_brick(data, [template, parent]) {
   tile.querySelector('#brick_size').innerText = data.size.join('x');
   tile.querySelector('#brick_weight').innerText = data.weight.toPrecision(3) / 1;
   // the division per 1 trim the trailing zeros (and remove the sci notation)
-  tile.querySelector('#brick_image').loading = "lazy";
-  tile.querySelector('#brick_image').src = !data.no_image ? 'textures/bricks/' + data.id + '.png' : 'textures/woosh.png';
+  let image = tile.querySelector('#brick_image');
+  let set_brick_image = () => {
+    let sprite = !data.no_image ? brick_atlas?.icons[data.id] : undefined;
+    if (sprite !== undefined) {
+      set_sprite(image, sprite);
+    } else {
+      image.loading = "lazy";
+      set_image(image, !data.no_image ? 'textures/bricks/' + data.id + '.png' : 'textures/woosh.png');
+    }
+  };
+  if (brick_atlas !== undefined)
+    set_brick_image();
+  else
+    fetch_brick_atlas().then(set_brick_image);
   if (!data.is_surplus) {
     tile.querySelector('#brick_source').style.visibility = "hidden";
   }
@@ -78,6 +145,90 @@ function load_brick(data, [template, parent]) {
   return tile;
 }
 
+let bricks_summary = null;
+let bricks_shards = {};
+let bricks_by_id = null;  // only fetched for data dumped without bricks/summary.json
+
+function fetch_bricks_summary() {
+  /* promise of bricks/summary.json, or of null if there is none */
+  bricks_summary ??= fetch('data/bricks/summary.json')
+    .then(response => response.ok ? response.json() : null)
+    .catch(() => null);
+  return bricks_summary;
+}
+
+function fetch_bricks_by_id() {
+  bricks_by_id ??= fetch('data/bricks_by_id.json').then(response => response.json());
+  return bricks_by_id;
+}
+
+function fetch_bricks() {
+  /* promise of {id: brick} with the fields needed by load_brick, from the small columnar
+  bricks/summary.json instead of the whole bricks_by_id.json (see fetch_brick_details for the rest) */
+  return fetch_bricks_summary().then(summary => {
+    if (summary === null)
+      return fetch_bricks_by_id();
+    let bricks = {};
+    let fields = Object.keys(summary).filter(field => field != 'shard_size');
+    for (let i = 0; i < summary.id.length; i++) {
+      let brick = {};
+      for (let field of fields) {
+        brick[field] = summary[field][i];
+      }
+      bricks[brick.id] = brick;
+    }
+    return bricks;
+  });
+}
+
+function fetch_brick_details(id) {
+  /* promise of the remaining fields of a brick (e.g. its sources), fetching only its shard
+  (undefined for an unknown brick) */
+  return fetch_bricks_summary().then(summary => {
+    if (summary === null)
+      return fetch_bricks_by_id().then(bricks => bricks[id]);
+    let i = summary.id.indexOf(Number(id));
+    if (i == -1)
+      return undefined;
+    let shard = Math.floor(i / summary.shard_size);
+    bricks_shards[shard] ??= fetch(`data/bricks/${shard}.json`).then(response => response.json());
+    return bricks_shards[shard].then(shard => shard[id]);
+  });
+}
+
+let usage_index = null;
+let brick_usage = null;
+
+function fetch_brick_usage(id) {
+  /* promise of the ids of the vehicles using a brick, only fetching its row of
+  the brick_usage_index.bin sparse rows (see data/usage_index.py), or the whole
+  data/brick_usage.json for data dumped before the index */
+  usage_index ??= fetch('data/brick_usage_index.json')
+    .then(response => response.ok ? response.json() : null)
+    .catch(() => null);
+  return usage_index.then(async index => {
+    if (index === null) {
+      brick_usage ??= fetch('data/brick_usage.json').then(response => response.json());
+      return (await brick_usage)[id] ?? [];
+    }
+    let i = index.brick_ids.indexOf(Number(id));
+    if (i === -1)  // unknown brick
+      return [];
+    if (index.offsets[i] == index.offsets[i + 1])
+      return [];
+    let [start, end] = [index.offsets[i] * 4, index.offsets[i + 1] * 4];
+    let response = await fetch('data/brick_usage_index.bin', {headers: {Range: `bytes=${start}-${end - 1}`}});
+    let buffer = await response.arrayBuffer();
+    if (response.status != 206)  // the server ignored the range and sent everything
+      buffer = buffer.slice(start, end);
+    let view = new DataView(buffer);
+    let vehicle_ids = [];
+    for (let offset = 0; offset < buffer.byteLength; offset += 4)
+      vehicle_ids.push(index.vehicle_ids[view.getUint32(offset, true)]);
+    return vehicle_ids;
+  });
+}
+
 function load_simple(data, [template, parent],
                      image_path = `textures/${parent.id}/${data.id}.png`) {
   
@@ -90,7 +241,7 @@ function load_simple(data, [template, parent],
   tile.classList.add(rarity);
 
   tile.querySelector('#image').loading = "lazy";
-  tile.querySelector('#image').src = !data.no_image ? image_path : 'textures/woosh.png';
+  set_image(tile.querySelector('#image'), !data.no_image ? image_path : 'textures/woosh.png');
   let itemType = removeSuffix(parent.id, 's'); // remove 's' plural, ex 'brickpacks' -> 'brickpack'
   tile.href = `${itemType}.html?${data.id}`;
   
@@ -98,6 +249,20 @@ function load_simple(data, [template, parent],
   return tile;
 }
 
+let sources_table = null;  // only fetched if some sources are indices into it, see resolve_sources
+
+function resolve_sources(sources) {
+  /* data dumped with --normalize-sources only have the source indices in sources.json,
+  return a promise of the actual source objects either way */
+  if (sources.every((source) => typeof source != 'number')) {
+    return Promise.resolve(sources);
+  }
+  sources_table ??= fetch('data/sources.json').then(response => response.json());
+  return sources_table.then(table => sources.map(
+    (source) => typeof source == 'number' ? table[source] : source
+  ));
+}
+
 function load_source(data, [_, parent])
 {
   let template = tiles.getElementById(data.type + "_template");
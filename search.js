@@ -1,4 +1,4 @@
-export { SuffixTree, all_words_in_name }
+export { SuffixTree, PrecomputedIndex, all_words_in_name }
 
 class suffixTreeNode {
     constructor() {
@@ -64,6 +64,76 @@ class SuffixTree {
     }
 }
 
+class PrecomputedIndex {
+    /* same results as a SuffixTree, but loaded from the search_index.json
+    suffix array built by data/search_index.py instead of filled tile by tile.
+    results are the [category, id] of the items, in the order they were indexed */
+    constructor(index) {
+        this.items = index.items;
+        this.text = index.text;
+        this.key_starts = index.key_starts;
+        this.key_items = index.key_items;
+        this.suffixes = index.suffixes;
+    }
+
+    bisect(pattern, strictly_after) {
+        /* first suffix whose beginning is >= pattern (> pattern if strictly_after) */
+        let lo = 0, hi = this.suffixes.length;
+        while (lo < hi) {
+            let mid = (lo + hi) >> 1;
+            let position = this.suffixes[mid];
+            let prefix = this.text.substring(position, position + pattern.length);
+            if (prefix < pattern || (strictly_after && prefix == pattern))
+                lo = mid + 1;
+            else
+                hi = mid;
+        }
+        return lo;
+    }
+
+    key_of(position) {
+        let lo = 0, hi = this.key_starts.length;
+        while (lo < hi) {
+            let mid = (lo + hi) >> 1;
+            if (this.key_starts[mid] <= position)
+                lo = mid + 1;
+            else
+                hi = mid;
+        }
+        return lo - 1;
+    }
+
+    search_pattern(pattern) {
+        /* return the set of the items indices having a key containing pattern */
+        pattern = pattern.toLowerCase();
+        let results = new Set();
+        if (pattern.length == 0)
+            return results;
+        let end = this.bisect(pattern, true);
+        for (let i = this.bisect(pattern, false); i < end; i++) {
+            for (let item of this.key_items[this.key_of(this.suffixes[i])])
+                results.add(item);
+        }
+        return results;
+    }
+
+    search_all_words(string) {
+        /* return the set intersection of a pattern search for each word in string */
+        let words = string.split(' ');
+        let results = null;
+        for (let i in words) {
+            let word = words[i];
+            if (i == 0) {
+                results = this.search_pattern(word);
+            }
+            else if (word.trim().length > 0) {
+                results = intersection(results, this.search_pattern(word));
+            }
+        }
+        return Array.from(results).sort((a, b) => a - b).map(i => this.items[i]);
+    }
+}
+
 function all_words_in_name(string, name, case_sensitive = false) {
     /* return true if all words of string are in name
     use this when you don't need the data structure,
@@ -1,4 +1,4 @@
-import { load_brick, load_source, load_async, snakecase } from './load.js';
+import { load_brick, load_source, resolve_sources, load_async, snakecase, fetch_bricks } from './load.js';
 import { tiles } from './tiles.js';
 
 {
@@ -6,12 +6,12 @@ import { tiles } from './tiles.js';
   
   Promise.all([
     fetch(`data/vehicle_parts/${id}.json`).then(response => response.json()),
-    fetch('data/bricks_by_id.json').then(response => response.json()),
+    fetch_bricks(),
     fetch('data/brick_aliases.json').then(response => response.json())
   ]
   ).then(([vehicle, all_bricks, brick_aliases]) => {
     load_vehicle(vehicle);
-    load_async(vehicle.sources, load_source, "sources");
+    resolve_sources(vehicle.sources).then(sources => load_async(sources, load_source, "sources"));
     load_parts(vehicle, all_bricks, brick_aliases);
   });
 }